@@ -1,3 +1,7 @@
+import math
+import time
+import asyncio
+import hashlib
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -5,8 +9,13 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from app.database import get_db
 from bson import ObjectId
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, \
+    USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS, TOKEN_CACHE_SIZE, PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, \
+    PASSWORD_HASH_QUEUE_SIZE, PASSWORD_HASH_RETRY_AFTER, PASSWORD_HASH_TARGET_MS, PASSWORD_HASH_MIN_ROUNDS, \
+    PASSWORD_HASH_MAX_ROUNDS
 from app.models import UserInDB
+from app.utils.cache import TTLCache
+from app.utils.hashing import PasswordHasher
 
 # Ustawiamy scope'y tutaj
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", scopes={
@@ -16,6 +25,14 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", scopes={
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Pula wykonująca bcrypt poza pętlą zdarzeń
+password_hasher = PasswordHasher(workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE_SIZE,
+                                 mode=PASSWORD_HASH_EXECUTOR, retry_after=PASSWORD_HASH_RETRY_AFTER)
+
+# Rozwiązani użytkownicy (po ID) i zdekodowane tokeny (po skrócie tokenu)
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 def hash_password(password: str) -> str:
     """
     Hashuje hasło przy użyciu algorytmu bcrypt.
@@ -41,6 +58,94 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple:
+    """
+    Weryfikuje hasło i, jeśli hash ma nieaktualny koszt, zwraca nowy hash.
+
+    Args:
+        plain_password (str): Hasło wprowadzone przez użytkownika.
+        hashed_password (str): Zahaszowane hasło w bazie danych.
+
+    Returns:
+        tuple: (czy hasło jest poprawne, nowy hash lub None).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hashuje hasło w puli `password_hasher`, nie blokując pętli zdarzeń.
+
+    Args:
+        password (str): Hasło do zahaszowania.
+
+    Raises:
+        HTTPException: 503, jeśli kolejka hashowania jest pełna.
+
+    Returns:
+        str: Zahaszowane hasło.
+    """
+    return await password_hasher.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple:
+    """
+    Weryfikuje hasło w puli `password_hasher`, nie blokując pętli zdarzeń.
+
+    Args:
+        plain_password (str): Hasło wprowadzone przez użytkownika.
+        hashed_password (str): Zahaszowane hasło w bazie danych.
+
+    Raises:
+        HTTPException: 503, jeśli kolejka hashowania jest pełna.
+
+    Returns:
+        tuple: (czy hasło jest poprawne, nowy hash lub None) - patrz `verify_and_update_password`.
+    """
+    return await password_hasher.run(verify_and_update_password, plain_password, hashed_password)
+
+def configure_bcrypt_rounds(rounds: int):
+    """
+    Ustawia koszt bcrypt; hashe o niższym koszcie będą przeliczane przy logowaniu.
+
+    Wywoływane także jako initializer workerów w trybie `process`.
+
+    Args:
+        rounds (int): Koszt (log2 liczby rund) bcrypt.
+    """
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+def calibrate_bcrypt_rounds(target_ms: int, probe_rounds: int = PASSWORD_HASH_MIN_ROUNDS) -> int:
+    """
+    Dobiera koszt bcrypt tak, aby jedno hashowanie trwało ok. `target_ms` na tej maszynie.
+
+    Każda dodatkowa runda podwaja czas, więc wystarczy jeden pomiar przy `probe_rounds`.
+
+    Args:
+        target_ms (int): Docelowy czas hashowania w milisekundach.
+        probe_rounds (int): Koszt użyty do pomiaru.
+
+    Returns:
+        int: Koszt w zakresie [PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS].
+    """
+    start = time.perf_counter()
+    pwd_context.handler("bcrypt").using(rounds=probe_rounds).hash("calibration")
+    elapsed_ms = max((time.perf_counter() - start) * 1000, 0.001)
+    rounds = probe_rounds + int(math.floor(math.log2(target_ms / elapsed_ms)))
+    return max(PASSWORD_HASH_MIN_ROUNDS, min(PASSWORD_HASH_MAX_ROUNDS, rounds))
+
+async def start_password_hasher():
+    """Kalibruje koszt bcrypt (jeśli włączone) i uruchamia pulę hashowania - wywoływane przy starcie aplikacji."""
+    if PASSWORD_HASH_TARGET_MS > 0:
+        rounds = await asyncio.get_running_loop().run_in_executor(None, calibrate_bcrypt_rounds, PASSWORD_HASH_TARGET_MS)
+        configure_bcrypt_rounds(rounds)
+        print(f"🔐 Koszt bcrypt: {rounds}")
+        password_hasher.start(initializer=configure_bcrypt_rounds, initargs=(rounds,))
+    else:
+        password_hasher.start()
+
+def stop_password_hasher():
+    """Zamyka pulę hashowania - wywoływane przy zamykaniu aplikacji."""
+    password_hasher.shutdown()
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """
     Tworzy access token z danymi użytkownika i czasem wygaśnięcia.
@@ -88,10 +193,53 @@ def verify_token(token: str):
     except JWTError:
         return None
 
+def decode_token_cached(token: str) -> dict:
+    """
+    Dekoduje token JWT, zapamiętując wynik do momentu wygaśnięcia tokenu.
+
+    Args:
+        token (str): Token do zdekodowania.
+
+    Raises:
+        JWTError: Jeśli token jest nieprawidłowy lub wygasł.
+
+    Returns:
+        dict: Dekodowane dane tokenu.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = payload.get("exp")
+        if exp is not None:
+            token_cache.set(key, payload, ttl=exp - time.time())
+    return payload
+
+def invalidate_user(user_id: str):
+    """
+    Usuwa użytkownika z cache - wywoływane po zmianie lub usunięciu jego danych.
+
+    Args:
+        user_id (str): ID użytkownika.
+    """
+    user_cache.invalidate(str(user_id))
+
+def cache_stats() -> dict:
+    """
+    Zwraca liczniki trafień/chybień cache'y używanych przy uwierzytelnianiu.
+
+    Returns:
+        dict: Statystyki cache użytkowników i tokenów.
+    """
+    return {"users": user_cache.stats(), "tokens": token_cache.stats()}
+
 async def get_current_user(security_scopes: SecurityScopes, token: str = Depends(oauth2_scheme), db=Depends(get_db)):
     """
     Pobiera aktualnego użytkownika na podstawie tokenu i sprawdza jego uprawnienia.
 
+    Zdekodowany token i dane użytkownika są brane z cache, więc większość zapytań
+    nie odpytuje kolekcji `users`.
+
     Args:
         security_scopes (SecurityScopes): Scopes wymagane do dostępu do zasobów.
         token (str): Token użytkownika.
@@ -109,7 +257,7 @@ async def get_current_user(security_scopes: SecurityScopes, token: str = Depends
         headers={"WWW-Authenticate": f"Bearer scope='{security_scopes.scope_str}'"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token_cached(token)
         user_id: str = payload.get("sub")
         token_scopes = payload.get("scopes", [])
         if user_id is None:
@@ -117,9 +265,14 @@ async def get_current_user(security_scopes: SecurityScopes, token: str = Depends
     except JWTError:
         raise credentials_exception
 
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if user is None:
-        raise credentials_exception
+    current_user = user_cache.get(user_id)
+    if current_user is None:
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        if user is None:
+            raise credentials_exception
+        current_user = UserInDB(id=str(user["_id"]), username=user["username"],
+            email=user["email"],  role=user["role"], password=user["password"])
+        user_cache.set(user_id, current_user)
 
     for scope in security_scopes.scopes:
         if scope not in token_scopes:
@@ -127,5 +280,4 @@ async def get_current_user(security_scopes: SecurityScopes, token: str = Depends
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions",
             )
-    return UserInDB(id=str(user["_id"]), username=user["username"],
-        email=user["email"],  role=user["role"], password=user["password"])
+    return current_user
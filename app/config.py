@@ -4,4 +4,92 @@ MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
-REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
\ No newline at end of file
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+DEFAULT_MAX_STEPS = int(os.getenv("DEFAULT_MAX_STEPS", 10000))
+STEPS_BATCH_MAX_ITEMS = int(os.getenv("STEPS_BATCH_MAX_ITEMS", 1000))
+
+# Cache'e w pamięci procesu (każdy worker ma własną kopię)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+# Hashowanie haseł (bcrypt) poza pętlą zdarzeń
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread | process
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 32))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+PASSWORD_HASH_TARGET_MS = int(os.getenv("PASSWORD_HASH_TARGET_MS", 250))  # 0 wyłącza kalibrację
+PASSWORD_HASH_MIN_ROUNDS = int(os.getenv("PASSWORD_HASH_MIN_ROUNDS", 10))
+PASSWORD_HASH_MAX_ROUNDS = int(os.getenv("PASSWORD_HASH_MAX_ROUNDS", 16))
+
+# Stronicowanie list (keyset)
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", 100))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", 500))
+
+# Eksport historii kalendarza
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+EXPORT_MAX_BATCH_SIZE = int(os.getenv("EXPORT_MAX_BATCH_SIZE", 5000))
+
+# Plany treningowe rozpisywane na dni kalendarza
+PLAN_MAX_DAYS = int(os.getenv("PLAN_MAX_DAYS", 366))
+# Maksymalna liczba operacji w jednym PATCH /calendar/{calendar_id}/exercises
+EXERCISE_PATCH_MAX_OPERATIONS = int(os.getenv("EXERCISE_PATCH_MAX_OPERATIONS", 200))
+
+# Synchronizacja przyrostowa (GET /sync)
+SYNC_PAGE_LIMIT = int(os.getenv("SYNC_PAGE_LIMIT", 500))  # dokumentów na źródło w jednej odpowiedzi
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", 2))  # zakładka na zapisy zatwierdzone z opóźnieniem
+SYNC_TOMBSTONE_TTL_DAYS = int(os.getenv("SYNC_TOMBSTONE_TTL_DAYS", 90))  # starszy token = pełna synchronizacja
+
+# Zdarzenia na żywo (GET /events, SSE)
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")  # local | change_stream (kilka workerów, wymaga replica setu)
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", 100))  # zdarzeń w buforze jednego połączenia
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+
+# Magazyn plików (filmy i miniatury ćwiczeń)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "minio")  # minio | local
+LOCAL_STORAGE_PATH = os.getenv("LOCAL_STORAGE_PATH", "/data/media")
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "http://minio:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
+MINIO_BUCKET = os.getenv("MINIO_BUCKET", "exercises")
+MINIO_REGION = os.getenv("MINIO_REGION", "us-east-1")  # znany region - podpisywanie URL-i bez zapytania do MinIO
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", 8 * 1024 * 1024))  # MinIO wymaga min. 5 MB na część
+MAX_VIDEO_SIZE = int(os.getenv("MAX_VIDEO_SIZE", 4 * 1024 * 1024 * 1024))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 256 * 1024))
+PRESIGNED_URL_EXPIRES = int(os.getenv("PRESIGNED_URL_EXPIRES", 900))
+PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN", 60))
+
+# Generowanie miniatur i wersji filmów w tle
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", 2))  # rozmiar puli procesów i limit równoległych zadań
+MEDIA_JOB_TIMEOUT = int(os.getenv("MEDIA_JOB_TIMEOUT", 600))
+MEDIA_JOB_LEASE = int(os.getenv("MEDIA_JOB_LEASE", 60))  # dzierżawa zadania w sekundach, odnawiana co 1/3 w trakcie pracy
+THUMBNAIL_WIDTHS = [int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "160,320,640").split(",")]
+MEDIA_RENDITION_ENABLED = os.getenv("MEDIA_RENDITION_ENABLED", "false").lower() == "true"
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+
+# Szybka ścieżka odpowiedzi: orjson i serializacja dokumentów bez budowania modeli Pydantic
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false").lower() == "true"
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"  # w trybie DEBUG szybka ścieżka waliduje odpowiedzi
+
+# Metryki Prometheusa (/metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Pula połączeń MongoDB (każdy worker ma własną pulę)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))  # liczba workerów serwera
+MONGO_POOL_BUDGET = int(os.getenv("MONGO_POOL_BUDGET", 0))  # łączny limit połączeń wszystkich workerów (0 - brak)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))  # limit na worker, gdy nie ustawiono budżetu
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))  # połączenia otwierane przy starcie
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")  # np. "zstd,snappy,zlib" (zstd/snappy wymagają pakietów)
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))
+DB_STARTUP_ATTEMPTS = int(os.getenv("DB_STARTUP_ATTEMPTS", 5))  # próby migracji przy starcie, potem start się nie udaje
+DB_STARTUP_RETRY_DELAY = float(os.getenv("DB_STARTUP_RETRY_DELAY", 2))
+MIGRATION_LOCK_TTL = int(os.getenv("MIGRATION_LOCK_TTL", 300))  # blokada migracji procesu, który padł, wygasa po tym czasie
+
+# Unieważnianie cache'y między workerami (liczniki wersji w kolekcji cache_versions)
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", 1.0))
+
+# Identyfikatory dni kalendarza: objectid (losowe) | day ("<user_id>:<YYYYMMDD>", po migracji app.utils.calendar_ids)
+CALENDAR_ID_MODE = os.getenv("CALENDAR_ID_MODE", "objectid")
@@ -1,28 +1,101 @@
+import asyncio
+from fastapi import HTTPException
 from motor.motor_asyncio import AsyncIOMotorClient
-from app.config import MONGO_URL
+from app.config import MONGO_URL, METRICS_ENABLED, WEB_CONCURRENCY, MONGO_POOL_BUDGET, MONGO_MAX_POOL_SIZE, \
+    MONGO_MIN_POOL_SIZE, MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, \
+    MONGO_COMPRESSORS, HEALTH_CHECK_TIMEOUT, DB_STARTUP_ATTEMPTS, DB_STARTUP_RETRY_DELAY
+from app.metrics import command_listener
+from app.migrations import run_migrations
 
 
 client = None
 db = None
 
+def pool_options() -> dict:
+    """
+    Ustawienia puli połączeń Motora.
+
+    Przy ustawionym MONGO_POOL_BUDGET limit jednego workera to budżet podzielony przez
+    WEB_CONCURRENCY, więc łączna liczba połączeń do MongoDB nie zależy od liczby workerów.
+
+    Returns:
+        dict: Argumenty dla AsyncIOMotorClient.
+    """
+    max_pool_size = MONGO_MAX_POOL_SIZE
+    if MONGO_POOL_BUDGET:
+        max_pool_size = max(MONGO_POOL_BUDGET // max(WEB_CONCURRENCY, 1), 1)
+    options = {
+        "maxPoolSize": max_pool_size,
+        "minPoolSize": min(MONGO_MIN_POOL_SIZE, max_pool_size),
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+async def warm_pool():
+    """Otwiera minPoolSize połączeń przy starcie (równoległe pingi), żeby pierwsze żądania nie czekały na połączenie."""
+    size = client.options.pool_options.min_pool_size
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(size, 1))))
+
 async def connect_db():
     global client, db
-    client = AsyncIOMotorClient(MONGO_URL)
+    listeners = [command_listener] if METRICS_ENABLED else []
+    client = AsyncIOMotorClient(MONGO_URL, event_listeners=listeners, **pool_options())
     db = client["fitness_app"]
     print(f"🔗 Połączono z bazą: {db}")  # Debugging
     try:
-        if "users" not in await db.list_collection_names():
-            await db.create_collection("users")
-        if "calendar" not in await db.list_collection_names():
-            await db.create_collection("calendar")
-        if "exercises" not in await db.list_collection_names():
-            await db.create_collection("exercises")
+        await warm_pool()
     except Exception as e:
-        print(f"Error connecting to the database: {e}")
+        # Rozgrzanie puli to tylko optymalizacja - jego błąd nie może blokować migracji
+        print(f"⚠️ Nie udało się rozgrzać puli połączeń: {e}")
+    # Bez migracji (m.in. unikalnych indeksów) aplikacja nie może przyjmować zapisów - po ostatniej
+    # nieudanej próbie błąd przerywa start workera zamiast obsługiwać żądania na niepełnym schemacie
+    for attempt in range(1, DB_STARTUP_ATTEMPTS + 1):
+        try:
+            if "users" not in await db.list_collection_names():
+                await db.create_collection("users")
+            if "calendar" not in await db.list_collection_names():
+                await db.create_collection("calendar")
+            if "exercises" not in await db.list_collection_names():
+                await db.create_collection("exercises")
+            await run_migrations(db)
+            return
+        except Exception as e:
+            if attempt == DB_STARTUP_ATTEMPTS:
+                print(f"❌ Nie udało się przygotować bazy danych: {e}")
+                raise
+            print(f"⚠️ Przygotowanie bazy danych nie powiodło się (próba {attempt}/{DB_STARTUP_ATTEMPTS}): {e}")
+            await asyncio.sleep(DB_STARTUP_RETRY_DELAY)
+
+async def close_db():
+    """Zamyka pulę połączeń przy wyłączaniu aplikacji."""
+    global client, db
+    if client is not None:
+        client.close()
+        print("🔌 Zamknięto połączenie z bazą")
+    client, db = None, None
+
+async def ping_db() -> bool:
+    """Sprawdza, czy baza odpowiada w czasie HEALTH_CHECK_TIMEOUT."""
+    if client is None:
+        return False
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), HEALTH_CHECK_TIMEOUT)
+        return True
+    except Exception:
+        return False
 
 async def get_db():
-    """Zwraca instancję bazy danych"""
+    """
+    Zwraca instancję bazy danych.
+
+    Raises:
+        HTTPException: Jeśli połączenie nie jest gotowe, zgłasza błąd 503 (Service Unavailable).
+    """
     global db
     if db is None:
-        raise RuntimeError("🚨 Brak połączenia z bazą!")
-    return db
\ No newline at end of file
+        raise HTTPException(status_code=503, detail="Database not available", headers={"Retry-After": "1"})
+    return db
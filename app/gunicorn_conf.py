@@ -0,0 +1,31 @@
+"""
+Konfiguracja gunicorna dla trybu produkcyjnego: N workerów uvicorna na jednym porcie.
+
+Uruchomienie: gunicorn -c python:app.gunicorn_conf app.main:app
+
+Aplikacja jest ładowana w procesie głównym przed forkiem (preload_app), a połączenia z MongoDB,
+pule bcrypta i zadania w tle powstają w lifespan każdego workera. Cache'e w pamięci (użytkownicy,
+tokeny, katalog ćwiczeń, podpisane URL-e) są osobne w każdym workerze - patrz README.
+"""
+import os
+import multiprocessing
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# Przy więcej niż jednym workerze zdarzenia na żywo (GET /events) wymagają EVENTS_BACKEND=change_stream -
+# domyślny tryb `local` rozsyła je tylko w obrębie workera, który wykonał zapis (worker ostrzega przy starcie)
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+# Recykling workerów - jitter, żeby nie restartowały się wszystkie naraz
+max_requests = int(os.getenv("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 1000))
+
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+accesslog = os.getenv("ACCESS_LOG", "-")
+
+# Liczba workerów trafia do app.config (WEB_CONCURRENCY) przed załadowaniem aplikacji -
+# na jej podstawie dzielony jest budżet połączeń MongoDB (MONGO_POOL_BUDGET)
+os.environ["WEB_CONCURRENCY"] = str(workers)
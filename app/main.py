@@ -1,21 +1,59 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.routes import users
-from app.routes import excercise, calendar
+from app.routes import excercise, calendar, health, sync, events
 from contextlib import asynccontextmanager
-from app.database import connect_db
+from app import database
+from app.database import connect_db, close_db
+from app.auth import start_password_hasher, stop_password_hasher, user_cache
+from app.media import media_jobs
+from app.storage import get_storage
+from app.config import FAST_RESPONSES, METRICS_ENABLED
+from app.metrics import MetricsMiddleware, render_metrics
+from app.utils.serialization import FastJSONResponse
+from app.utils.catalog import exercise_catalog
+from app.utils.invalidation import cache_versions
+from app.utils.events import event_hub
+from app.utils.calendar_ids import load_migration_state
+
+# Cache'e w pamięci workera unieważniane także zmianami z innych workerów
+cache_versions.register("exercises", exercise_catalog.invalidate)
+cache_versions.register("users", user_cache.clear)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_db()  # Połączenie z bazą danych przy starcie
+    await load_migration_state(database.db)  # czy dni kalendarza można adresować po _id
+    await start_password_hasher()
+    await media_jobs.resume(database.db, get_storage())  # zadania przerwane przez restart
+    await cache_versions.start(database.db)
+    event_hub.start(database.db)
     yield
     # Tu możesz dodać cleanup, np. zamknięcie połączeń
+    event_hub.stop()
+    cache_versions.stop()
+    media_jobs.shutdown()
+    stop_password_hasher()
+    await close_db()
 
-app = FastAPI(lifespan=lifespan)
+# Szybka ścieżka: wszystkie odpowiedzi renderowane przez orjson
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse if FAST_RESPONSES else JSONResponse)
 
 # Rejestrowanie endpointów użytkowników
 app.include_router(users.router)
 app.include_router(excercise.router)
 app.include_router(calendar.router)
+app.include_router(health.router)
+app.include_router(sync.router)
+app.include_router(events.router)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        # Format tekstowy Prometheusa - tekst metryk powstaje dopiero przy odczycie
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
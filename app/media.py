@@ -0,0 +1,226 @@
+import os
+import asyncio
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from bson import ObjectId
+from pymongo import ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.config import MEDIA_WORKERS, MEDIA_JOB_TIMEOUT, MEDIA_JOB_LEASE, THUMBNAIL_WIDTHS, MEDIA_RENDITION_ENABLED, FFMPEG_PATH
+from app.storage import StorageBackend, file_chunks
+from app.utils.invalidation import cache_versions
+
+
+def _ffmpeg(*args: str):
+    subprocess.run([FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-y", *args],
+                   check=True, timeout=MEDIA_JOB_TIMEOUT, capture_output=True)
+
+
+def render_media(input_path: str, output_dir: str, widths: list, rendition: bool) -> dict:
+    """
+    Generuje z filmu klatkę tytułową, miniatury o podanych szerokościach i opcjonalnie lekką wersję filmu.
+
+    Uruchamiana w osobnym procesie (ProcessPoolExecutor) - poza procesem obsługującym żądania.
+
+    Args:
+        input_path (str): Ścieżka filmu.
+        output_dir (str): Katalog na wygenerowane pliki.
+        widths (list): Szerokości miniatur w pikselach.
+        rendition (bool): Czy wygenerować wersję 480p o niskiej przepływności.
+
+    Returns:
+        dict: Nazwa wariantu ("poster", "160", ..., "low") -> ścieżka pliku.
+    """
+    outputs = {}
+    poster = os.path.join(output_dir, "poster.jpg")
+    # Klatka z 1. sekundy; bardzo krótkie filmy - pierwsza klatka
+    for offset in ("1", "0"):
+        _ffmpeg("-ss", offset, "-i", input_path, "-frames:v", "1", "-q:v", "2", poster)
+        if os.path.exists(poster) and os.path.getsize(poster) > 0:
+            break
+    outputs["poster"] = poster
+
+    for width in widths:
+        thumbnail = os.path.join(output_dir, f"thumb-{width}.jpg")
+        _ffmpeg("-i", poster, "-vf", f"scale={width}:-2", "-q:v", "4", thumbnail)
+        outputs[str(width)] = thumbnail
+
+    if rendition:
+        low = os.path.join(output_dir, "low.mp4")
+        _ffmpeg("-i", input_path, "-vf", "scale=-2:480", "-c:v", "libx264", "-preset", "veryfast",
+                "-b:v", "600k", "-c:a", "aac", "-b:a", "64k", "-movflags", "+faststart", low)
+        outputs["low"] = low
+    return outputs
+
+
+def _lower_priority():
+    """Initializer procesów roboczych - niższy priorytet, żeby nie zabierać CPU obsłudze API."""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+class MediaJobQueue:
+    """
+    Kolejka zadań przetwarzania filmów ćwiczeń.
+
+    Stan zadań jest przechowywany w kolekcji `media_jobs`, a samo przetwarzanie odbywa się w puli
+    procesów z ograniczoną liczbą równoległych zadań. Zadanie jest przejmowane atomowo z dzierżawą
+    (`lease_until`), więc po awarii procesu może zostać podjęte ponownie. Dzierżawa jest krótka
+    i odnawiana przez cały czas pracy, więc długie przetwarzanie nie zostanie przejęte drugi raz.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: ProcessPoolExecutor = None
+        self._semaphore: asyncio.Semaphore = None
+        self._tasks = set()
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_lower_priority)
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+    async def enqueue(self, db: AsyncIOMotorDatabase, storage: StorageBackend, exercise_id: str,
+                      video_key: str) -> str:
+        """
+        Zapisuje zadanie i uruchamia je w tle.
+
+        Args:
+            db (AsyncIOMotorDatabase): Obiekt bazy danych.
+            storage (StorageBackend): Magazyn plików.
+            exercise_id (str): ID ćwiczenia.
+            video_key (str): Klucz filmu w magazynie.
+
+        Returns:
+            str: ID zadania.
+        """
+        job = {
+            "exercise_id": exercise_id,
+            "video_key": video_key,
+            "status": "queued",
+            "created_at": datetime.utcnow(),
+            "lease_until": None,
+        }
+        result = await db.media_jobs.insert_one(job)
+        self._spawn(db, storage, result.inserted_id)
+        return str(result.inserted_id)
+
+    async def resume(self, db: AsyncIOMotorDatabase, storage: StorageBackend):
+        """Podejmuje zadania oczekujące i te, których dzierżawa wygasła - wywoływane przy starcie aplikacji."""
+        query = {"$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_until": {"$lt": datetime.utcnow()}},
+        ]}
+        try:
+            async for job in db.media_jobs.find(query, {"_id": 1}):
+                self._spawn(db, storage, job["_id"])
+        except Exception as e:
+            print(f"⚠️ Nie udało się wznowić zadań przetwarzania filmów: {e}")
+
+    def _spawn(self, db, storage, job_id):
+        self._ensure_started()
+        task = asyncio.create_task(self._run(db, storage, job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _claim(self, db: AsyncIOMotorDatabase, job_id) -> dict:
+        now = datetime.utcnow()
+        return await db.media_jobs.find_one_and_update(
+            {"_id": job_id, "$or": [{"status": "queued"}, {"status": "running", "lease_until": {"$lt": now}}]},
+            {"$set": {"status": "running", "started_at": now, "lease_owner": ObjectId(),
+                      "lease_until": now + timedelta(seconds=MEDIA_JOB_LEASE)},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _heartbeat(self, db: AsyncIOMotorDatabase, job: dict):
+        """Odnawia dzierżawę zadania, dopóki trwa jego przetwarzanie (anulowane po zakończeniu)."""
+        while True:
+            await asyncio.sleep(MEDIA_JOB_LEASE / 3)
+            try:
+                result = await db.media_jobs.update_one(
+                    {"_id": job["_id"], "status": "running", "lease_owner": job["lease_owner"]},
+                    {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=MEDIA_JOB_LEASE)}},
+                )
+            except Exception as e:
+                print(f"⚠️ Nie udało się odnowić dzierżawy zadania {job['_id']}: {e}")
+                continue
+            if result.matched_count == 0:
+                print(f"⚠️ Zadanie {job['_id']} utraciło dzierżawę")
+                return
+
+    async def _run(self, db: AsyncIOMotorDatabase, storage: StorageBackend, job_id):
+        async with self._semaphore:
+            job = await self._claim(db, job_id)
+            if job is None:
+                return  # zadanie przejął inny proces
+            heartbeat = asyncio.create_task(self._heartbeat(db, job))
+            try:
+                outputs = await self._process(storage, job)
+                await self._finish(db, job, outputs)
+            except Exception as e:
+                await db.media_jobs.update_one(
+                    {"_id": job_id, "lease_owner": job["lease_owner"]},
+                    {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}},
+                )
+                print(f"⚠️ Zadanie {job_id} nie powiodło się: {e}")
+            finally:
+                heartbeat.cancel()
+
+    async def _process(self, storage: StorageBackend, job: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        exercise_id = job["exercise_id"]
+        with tempfile.TemporaryDirectory(prefix="media-job-") as workdir:
+            input_path = storage.local_path(job["video_key"])
+            if input_path is None:
+                # Magazyn zdalny - film pobieramy strumieniowo do pliku tymczasowego
+                input_path = os.path.join(workdir, "input")
+                size = await storage.size(job["video_key"])
+                with open(input_path, "wb") as file:
+                    async for chunk in storage.get_range(job["video_key"], 0, size - 1):
+                        await loop.run_in_executor(None, file.write, chunk)
+
+            rendered = await loop.run_in_executor(
+                self._executor, render_media, input_path, workdir, THUMBNAIL_WIDTHS, MEDIA_RENDITION_ENABLED,
+            )
+
+            outputs = {}
+            for variant, path in rendered.items():
+                content_type = "video/mp4" if variant == "low" else "image/jpeg"
+                extension = ".mp4" if variant == "low" else ".jpg"
+                key = f"exercises/{exercise_id}/{variant}-{ObjectId()}{extension}"
+                await storage.put_stream(key, file_chunks(path), content_type)
+                outputs[variant] = key
+            return outputs
+
+    async def _finish(self, db: AsyncIOMotorDatabase, job: dict, outputs: dict):
+        exercise_id = job["exercise_id"]
+        media = {
+            "updated_at": datetime.utcnow(),
+            "thumbnail_url": f"/exercise/{exercise_id}/thumbnail",
+            "thumbnail_keys": {variant: key for variant, key in outputs.items() if variant != "low"},
+        }
+        if "low" in outputs:
+            media["rendition_key"] = outputs["low"]
+        # Zapisujemy tylko, jeśli film nie został w międzyczasie podmieniony
+        await db.exercises.update_one({"_id": ObjectId(exercise_id), "video_key": job["video_key"]},
+                                      {"$set": media})
+        await db.media_jobs.update_one(
+            {"_id": job["_id"], "lease_owner": job["lease_owner"]},
+            {"$set": {"status": "done", "outputs": outputs, "finished_at": datetime.utcnow()}},
+        )
+        await cache_versions.publish(db, "exercises")
+
+    def shutdown(self):
+        """Przerywa zadania w toku i zamyka pulę - przerwane zadania zostaną podjęte po restarcie."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+media_jobs = MediaJobQueue(MEDIA_WORKERS)
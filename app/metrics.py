@@ -0,0 +1,190 @@
+import time
+import bisect
+import threading
+from contextvars import ContextVar
+from pymongo import monitoring
+
+# Przedziały histogramów (w sekundach / w liczbie zapytań)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+ROUNDTRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """
+    Histogram w formacie Prometheusa z etykietami.
+
+    Pomiar to jedno wyszukiwanie binarne i kilka inkrementacji; tekst do eksportu
+    powstaje dopiero przy odczycie (`render`), więc bez odczytów koszt jest pomijalny.
+    """
+
+    def __init__(self, name: str, description: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # etykiety -> [liczniki przedziałów..., +Inf, suma]
+        self._lock = threading.Lock()  # pomiary Mongo przychodzą z wątków Motora
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Licznik w formacie Prometheusa z etykietami."""
+
+    def __init__(self, name: str, description: str, labels: tuple, kind: str = "counter"):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.kind = kind
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for label_values, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+http_request_duration = Histogram("http_request_duration_seconds", "Czas obsługi żądania HTTP",
+                                  ("method", "route", "status"), HTTP_BUCKETS)
+http_requests_in_flight = Counter("http_requests_in_flight", "Żądania HTTP w trakcie obsługi", ("method",), "gauge")
+mongo_command_duration = Histogram("mongo_command_duration_seconds", "Czas wykonania polecenia MongoDB",
+                                   ("collection", "command"), MONGO_BUCKETS)
+mongo_command_failures = Counter("mongo_command_failures_total", "Nieudane polecenia MongoDB",
+                                 ("collection", "command"))
+db_roundtrips = Histogram("http_request_db_roundtrips", "Liczba poleceń MongoDB na żądanie HTTP",
+                          ("method", "route"), ROUNDTRIP_BUCKETS)
+
+METRICS = (http_request_duration, http_requests_in_flight, db_roundtrips, mongo_command_duration,
+           mongo_command_failures)
+
+
+def render_metrics() -> str:
+    """Zwraca wszystkie metryki w formacie tekstowym Prometheusa."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _RequestStats:
+    __slots__ = ("db_calls",)
+
+    def __init__(self):
+        self.db_calls = 0
+
+
+# Statystyki bieżącego żądania - Motor kopiuje kontekst do wątków, więc listener widzi ten sam obiekt
+_request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Mierzy czas poleceń MongoDB per kolekcja/polecenie i zlicza polecenia bieżącego żądania HTTP."""
+
+    def __init__(self):
+        self._pending = {}  # (connection, request_id) -> (kolekcja, polecenie)
+
+    def started(self, event):
+        name = event.command_name
+        collection = event.command.get(name)
+        if name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+        self._pending[(event.connection_id, event.request_id)] = (collection, name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_calls += 1
+
+    def succeeded(self, event):
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            mongo_command_duration.observe(event.duration_micros / 1e6, *labels)
+
+    def failed(self, event):
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            mongo_command_duration.observe(event.duration_micros / 1e6, *labels)
+            mongo_command_failures.inc(*labels)
+
+
+command_listener = MongoCommandListener()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI mierzące czas, kody odpowiedzi, liczbę żądań w toku i liczbę poleceń MongoDB na żądanie.
+
+    Jako etykieta trasy używany jest szablon ścieżki (np. "/calendar/{calendar_id}"), a nie sama
+    ścieżka, żeby liczba serii nie rosła z liczbą identyfikatorów.
+    """
+
+    def __init__(self, app, exclude: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            http_requests_in_flight.inc(method, amount=-1)
+            _request_stats.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(duration, method, route, status_code)
+            db_roundtrips.observe(stats.db_calls, method, route)
@@ -0,0 +1,236 @@
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.config import SYNC_TOMBSTONE_TTL_DAYS, MIGRATION_LOCK_TTL
+
+
+async def _initial_indexes(db: AsyncIOMotorDatabase):
+    """Podstawowe indeksy: unikalny dzień użytkownika, email oraz nazwa ćwiczenia."""
+    await db.calendar.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="calendar_user_date", unique=True),
+        IndexModel([("exercises.id", ASCENDING)], name="calendar_exercises_id"),
+    ])
+    await db.users.create_indexes([
+        IndexModel([("email", ASCENDING)], name="users_email", unique=True),
+    ])
+    await db.exercises.create_indexes([
+        IndexModel([("name", ASCENDING)], name="exercises_name", unique=True),
+    ])
+
+
+async def _calendar_pagination_index(db: AsyncIOMotorDatabase):
+    """
+    Dawniej indeks (user_id, date, _id) pod stronicowanie kalendarza - zbędny obok unikalnego
+    calendar_user_date, więc nowe bazy go nie tworzą, a istniejące usuwa migracja 8.
+    """
+
+
+async def _steps_rollups_index(db: AsyncIOMotorDatabase):
+    """Indeks pod odczyt zestawień kroków użytkownika w kolejności okresów."""
+    await db.steps_rollups.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("granularity", ASCENDING), ("start", ASCENDING)],
+                   name="steps_rollups_user_granularity_start"),
+    ])
+
+
+async def _exercise_search_indexes(db: AsyncIOMotorDatabase):
+    """Indeks tekstowy (nazwa, opis) i indeks filtrów (exerciseType, difficulty) dla wyszukiwarki ćwiczeń."""
+    await db.exercises.create_indexes([
+        IndexModel([("name", TEXT), ("description", TEXT)], name="exercises_text",
+                   weights={"name": 10, "description": 1}),
+        IndexModel([("exerciseType", ASCENDING), ("difficulty", ASCENDING)], name="exercises_type_difficulty"),
+    ])
+
+
+async def _media_jobs_indexes(db: AsyncIOMotorDatabase):
+    """Indeksy zadań przetwarzania filmów: ostatnie zadanie ćwiczenia i zadania do podjęcia po restarcie."""
+    await db.media_jobs.create_indexes([
+        IndexModel([("exercise_id", ASCENDING), ("created_at", DESCENDING)], name="media_jobs_exercise_created"),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="media_jobs_status_lease"),
+    ])
+
+
+async def _calendar_legacy_id_index(db: AsyncIOMotorDatabase):
+    """Indeks starych ObjectId dni przepisanych na deterministyczne _id (tłumaczenie dawnych calendar_id)."""
+    await db.calendar.create_indexes([
+        IndexModel([("legacy_id", ASCENDING)], name="calendar_legacy_id", sparse=True),
+    ])
+
+
+async def _sync_indexes(db: AsyncIOMotorDatabase):
+    """
+    Synchronizacja przyrostowa: indeksy zmian po `updated_at` i ślady usunięć (z TTL).
+
+    Uzupełnienie `updated_at` w dokumentach sprzed tej wersji to osobny krok poza startem workera
+    (`backfill_updated_at`) - do tego czasu GET /sync obsługuje dokumenty bez tego pola.
+    """
+    await db.calendar.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)],
+                   name="calendar_user_updated_id"),
+    ])
+    await db.exercises.create_indexes([
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="exercises_updated_id"),
+    ])
+    await db.tombstones.create_indexes([
+        IndexModel([("user_id", ASCENDING), ("deleted_at", ASCENDING), ("_id", ASCENDING)],
+                   name="tombstones_user_deleted_id"),
+        IndexModel([("deleted_at", ASCENDING)], name="tombstones_ttl",
+                   expireAfterSeconds=SYNC_TOMBSTONE_TTL_DAYS * 24 * 3600),
+    ])
+
+
+async def _drop_calendar_pagination_index(db: AsyncIOMotorDatabase):
+    """Usuwa indeks (user_id, date, _id) - stronicowanie kalendarza korzysta z unikalnego calendar_user_date."""
+    try:
+        await db.calendar.drop_index("calendar_user_date_id")
+    except OperationFailure:
+        pass  # indeksu nie ma (baza utworzona już bez niego)
+
+
+# Blokada stosowania migracji (dokument w `schema_migrations`)
+MIGRATION_LOCK = "lock"
+
+# Kolejne migracje dopisujemy na końcu listy z rosnącym numerem wersji
+MIGRATIONS = [
+    (1, "initial indexes", _initial_indexes),
+    (2, "calendar pagination index", _calendar_pagination_index),
+    (3, "steps rollups index", _steps_rollups_index),
+    (4, "exercise search indexes", _exercise_search_indexes),
+    (5, "media jobs indexes", _media_jobs_indexes),
+    (6, "calendar legacy id index", _calendar_legacy_id_index),
+    (7, "sync indexes and tombstones", _sync_indexes),
+    (8, "drop redundant calendar pagination index", _drop_calendar_pagination_index),
+]
+
+
+async def run_migrations(db: AsyncIOMotorDatabase):
+    """
+    Uruchamia wszystkie migracje, które nie zostały jeszcze zastosowane.
+
+    Aktualna wersja schematu jest przechowywana w kolekcji `schema_migrations`.
+    Migracje muszą być idempotentne, bo kilka procesów może startować jednocześnie.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+
+    Returns:
+        int: Wersja schematu po zakończeniu migracji.
+    """
+    state = await db.schema_migrations.find_one({"_id": "schema"})
+    current = state["version"] if state else 0
+    if current >= MIGRATIONS[-1][0]:
+        return current  # zwykły restart - bez blokady
+
+    # Migracje stosuje jeden proces naraz; pozostałe czekają na zwolnienie blokady i widzą już aktualną wersję
+    owner = ObjectId()
+    while not await _acquire_lock(db, owner):
+        await asyncio.sleep(1)
+    try:
+        state = await db.schema_migrations.find_one({"_id": "schema"})
+        current = state["version"] if state else 0
+
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            await migrate(db)
+            await db.schema_migrations.update_one(
+                {"_id": "schema"},
+                {
+                    "$set": {"version": version},
+                    "$push": {"history": {"version": version, "description": description,
+                                          "applied_at": datetime.utcnow()}},
+                },
+                upsert=True,
+            )
+            current = version
+            print(f"🛠️ Zastosowano migrację {version}: {description}")
+    finally:
+        await db.schema_migrations.delete_one({"_id": MIGRATION_LOCK, "owner": owner})
+
+    return current
+
+
+async def _acquire_lock(db: AsyncIOMotorDatabase, owner: ObjectId) -> bool:
+    """
+    Przejmuje blokadę migracji (dokument w `schema_migrations`) na MIGRATION_LOCK_TTL sekund.
+
+    Blokada procesu, który padł w trakcie migracji, wygasa sama. Gdy trzyma ją inny proces, upsert
+    kończy się naruszeniem unikalnego `_id`.
+
+    Returns:
+        bool: Czy blokada należy teraz do `owner`.
+    """
+    now = datetime.utcnow()
+    try:
+        await db.schema_migrations.find_one_and_update(
+            {"_id": MIGRATION_LOCK, "$or": [{"locked_until": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "locked_until": now + timedelta(seconds=MIGRATION_LOCK_TTL)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def backfill_updated_at(db: AsyncIOMotorDatabase, batch_size: int = 1000, pause: float = 0.0) -> int:
+    """
+    Uzupełnia `updated_at` w dniach kalendarza i ćwiczeniach sprzed synchronizacji przyrostowej (partiami).
+
+    Uruchamiane jednorazowo z wiersza poleceń, nie przy starcie workera - na dużej bazie trwa dłużej
+    niż limit czasu startu workera gunicorna.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        batch_size (int): Liczba dokumentów w partii.
+        pause (float): Przerwa między partiami w sekundach (ogranicza obciążenie bazy).
+
+    Returns:
+        int: Liczba uzupełnionych dokumentów.
+    """
+    updated = 0
+    for collection in (db.calendar, db.exercises):
+        now = datetime.utcnow()
+        ids = []
+        async for doc in collection.find({"updated_at": {"$exists": False}}, {"_id": 1}).sort("_id", 1):
+            ids.append(doc["_id"])
+            if len(ids) < batch_size:
+                continue
+            result = await collection.update_many({"_id": {"$in": ids}, "updated_at": {"$exists": False}},
+                                                  {"$set": {"updated_at": now}})
+            updated += result.modified_count
+            ids = []
+            if pause:
+                await asyncio.sleep(pause)
+        if ids:
+            result = await collection.update_many({"_id": {"$in": ids}, "updated_at": {"$exists": False}},
+                                                  {"$set": {"updated_at": now}})
+            updated += result.modified_count
+    return updated
+
+
+async def _main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.config import MONGO_URL
+
+    parser = argparse.ArgumentParser(description="Migracje schematu i jednorazowe uzupełnienia danych")
+    parser.add_argument("--backfill", action="store_true", help="Uzupełnij updated_at w starych dokumentach")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.0, help="Przerwa między partiami (s)")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    try:
+        db = client["fitness_app"]
+        print(f"✅ Wersja schematu: {await run_migrations(db)}")
+        if args.backfill:
+            print(f"✅ Uzupełniono updated_at w {await backfill_updated_at(db, args.batch_size, args.pause)} dokumentach")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
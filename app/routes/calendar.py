@@ -1,17 +1,35 @@
-from typing import List
+from typing import List, Optional, Literal
 from bson import ObjectId
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Response, status
 from app.database import get_db
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.auth import get_current_user
 from app.schemas import CalendarCreate, CalendarResponse, StepsResponse, StepsUpdate, StepsHistoryResponse, \
-    ExercisePerformanceResponse, ExercisePerformanceCreate, StepsGoalUpdate
+    ExercisePerformanceResponse, ExercisePerformanceCreate, StepsGoalUpdate, StepsBatchItem, StepsBatchResult, Page, \
+    StepsSummaryResponse, CalendarPlan, CalendarPlanDelete, CalendarPlanResult, ExerciseOperation
 from app.models import CalendarInDB, ExercisePerformanceInDB
-from datetime import datetime
-from fastapi import Path
+from datetime import datetime, date
+from fastapi import Path, Query
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
-from app.utils.tools import today, check_day
+from app.utils.tools import today, check_day, day_start, apply_update, etag_matches
+from app.utils.rollups import update_rollups, rollup_operations, period_start
+from app.config import DEFAULT_MAX_STEPS, STEPS_BATCH_MAX_ITEMS, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, \
+    EXPORT_BATCH_SIZE, EXPORT_MAX_BATCH_SIZE, FAST_RESPONSES, CALENDAR_ID_MODE
+from app.utils.pagination import paginate, date_range_filter
+from app.utils.export import ndjson_rows, csv_rows
+from app.utils.catalog import load_exercise_summaries
+from app.utils.serialization import fast_response, calendar_item, steps_history_item
+from app.utils.calendar_ids import calendar_id_filter, day_filter, day_insert_fields, new_day_id, day_id
+from app.utils.exercise_ops import exercise_patch
+from app.utils.sync import record_tombstone
+from app.utils.events import event_hub, day_event, changed_event, deleted_event
+from app.utils.versioning import touch, day_etag, version_filter, raise_write_failed
+from app.utils.plans import plan_days, create_plan_operations, modify_plan_operations, delete_plan_filter, \
+    delete_plan_update
 
 router = APIRouter()
 
@@ -19,61 +37,284 @@ router = APIRouter()
 @router.post("/calendar", response_model=CalendarResponse)
 async def create_calendar_entry(
         calendar_data: CalendarCreate,
+        response: Response,
         db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
         current_user=Depends(get_current_user),
 ):
     calendar_inDB = CalendarInDB(**calendar_data.model_dump())
     calendar_inDB.user_id = current_user.id
-    await check_day(calendar_inDB.date, db) # czy już istnieje
-    result = await db.calendar.insert_one(calendar_inDB.model_dump(exclude={"id"}))
-
-    return CalendarResponse(id=str(result.inserted_id), **calendar_inDB.model_dump())
-
-@router.get("/calendar", response_model=List[CalendarResponse])
+    doc = {"_id": new_day_id(current_user.id, calendar_inDB.date), **calendar_inDB.model_dump(exclude={"id"}),
+           "version": 1, "updated_at": datetime.utcnow()}
+    with check_day(calendar_inDB.date): # czy już istnieje - pilnuje indeks (user_id, date)
+        result = await db.calendar.insert_one(doc)
+    await update_rollups(db, current_user.id, None, doc)
+    event_hub.publish(current_user.id, day_event(doc))
+
+    response.headers["ETag"] = day_etag(doc)
+    return CalendarResponse(id=str(result.inserted_id), **calendar_inDB.model_dump(),
+                            version=doc["version"], updated_at=doc["updated_at"])
+
+async def expand_exercises(db: AsyncIOMotorDatabase, docs: list):
+    """
+    Dołącza do każdego ćwiczenia w dniach podstawowe dane ćwiczenia z katalogu (pole `exercise`).
+
+    Wszystkie różne `exercise_id` ze strony są rozwiązywane naraz - bez zapytania na ćwiczenie.
+    """
+    exercise_ids = [ex["exercise_id"] for doc in docs for ex in doc.get("exercises") or [] if ex.get("exercise_id")]
+    if not exercise_ids:
+        return
+    summaries = await load_exercise_summaries(db, exercise_ids)
+    for doc in docs:
+        for ex in doc.get("exercises") or []:
+            ex["exercise"] = summaries.get(ex.get("exercise_id"))
+
+def calendar_query(user_id: str, date_from: date = None, date_to: date = None) -> dict:
+    """Filtr dni użytkownika, opcjonalnie zawężony do zakresu dat."""
+    query = {"user_id": user_id}
+    date_condition = date_range_filter(date_from, date_to)
+    if date_condition:
+        query["date"] = date_condition
+    return query
+
+# Data jest unikalna w obrębie użytkownika (indeks calendar_user_date), więc sama wystarcza jako klucz
+# stronicowania i sortowania - zapytania korzystają z unikalnego indeksu bez sortowania w pamięci
+CALENDAR_SORT = ("date",)
+
+@router.get("/calendar", response_model=Page[CalendarResponse])
 async def get_all_calendar_entries(
     db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
     current_user=Depends(get_current_user),
+    date_from: Optional[date] = Query(None, alias="from", description="Pierwszy dzień zakresu"),
+    date_to: Optional[date] = Query(None, alias="to", description="Ostatni dzień zakresu"),
+    cursor: Optional[str] = Query(None, description="Kursor z poprzedniej strony (next_cursor)"),
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    expand: Optional[Literal["exercise"]] = Query(None, description="Dołącz dane ćwiczeń z katalogu"),
 ):
-    # Pobierz wszystkie wpisy kalendarza użytkownika
+    # Strona wpisów kalendarza użytkownika, posortowana po dacie
+    docs, next_cursor = await paginate(
+        db.calendar, calendar_query(current_user.id, date_from, date_to), CALENDAR_SORT, cursor, limit
+    )
+    if expand == "exercise":
+        await expand_exercises(db, docs)
+    if FAST_RESPONSES:
+        return fast_response({"items": [calendar_item(doc) for doc in docs], "next_cursor": next_cursor},
+                             Page[CalendarResponse])
     entries = []
-    cursor = db.calendar.find({"user_id": current_user.id})
-    async for doc in cursor:
+    for doc in docs:
         doc["id"] = str(doc["_id"])
         entries.append(CalendarResponse(**doc))
-    return entries
+    return Page(items=entries, next_cursor=next_cursor)
+
+
+@router.get("/calendar/export")
+async def export_calendar(
+    db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+    current_user=Depends(get_current_user),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Format eksportu"),
+    date_from: Optional[date] = Query(None, alias="from", description="Pierwszy dzień zakresu"),
+    date_to: Optional[date] = Query(None, alias="to", description="Ostatni dzień zakresu"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=EXPORT_MAX_BATCH_SIZE,
+                            description="Liczba dokumentów pobieranych z bazy w jednej paczce"),
+):
+    """
+    Strumieniuje całą historię kalendarza użytkownika jako NDJSON lub CSV.
+
+    Wiersze są wysyłane w miarę czytania kursora, więc zużycie pamięci nie zależy od długości historii.
+    """
+    cursor = db.calendar.find(calendar_query(current_user.id, date_from, date_to)) \
+        .sort([(field, 1) for field in CALENDAR_SORT]) \
+        .batch_size(batch_size)
+
+    if format == "csv":
+        return StreamingResponse(csv_rows(cursor), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="calendar.csv"'})
+    return StreamingResponse(ndjson_rows(cursor), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="calendar.ndjson"'})
+
+
+@router.post("/calendar/plan", response_model=CalendarPlanResult)
+async def create_calendar_plan(
+        plan: CalendarPlan,
+        db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+        current_user=Depends(get_current_user),
+):
+    """
+    Rozpisuje plan treningowy (startDate - stopDate, godziny, ćwiczenia) na dni kalendarza.
+
+    Ćwiczenie z `intervalBetween_days` = n trafia co n+1 dni od startu. Cały plan to jeden `bulk_write`;
+    dni, których nie udało się zapisać, są zwracane w `failed`.
+    """
+    days, operations = create_plan_operations(current_user.id, plan)
+    if not operations:
+        return CalendarPlanResult(matched=0, modified=0, upserted=0)
+    try:
+        result = await db.calendar.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Przy `ordered=False` pozostałe dni zostały zapisane - zwracamy częściowy wynik i dni z błędem
+        event_hub.publish(current_user.id, changed_event())
+        return CalendarPlanResult(matched=e.details.get("nMatched", 0), modified=e.details.get("nModified", 0),
+                                  upserted=e.details.get("nUpserted", 0),
+                                  failed=[days[error["index"]] for error in e.details.get("writeErrors", [])])
+    event_hub.publish(current_user.id, changed_event())
+    return CalendarPlanResult(matched=result.matched_count, modified=result.modified_count,
+                              upserted=result.upserted_count)
+
+
+@router.put("/calendar/plan", response_model=CalendarPlanResult)
+async def modify_calendar_plan(
+        plan: CalendarPlan,
+        db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+        current_user=Depends(get_current_user),
+):
+    """
+    Zmienia plan w zakresie dat: istniejące ćwiczenia o tej godzinie są nadpisywane, brakujące dodawane.
+
+    Dni, których nie udało się zmienić (po błędzie zapis jest przerywany), są zwracane w `failed`.
+    """
+    days, operations = modify_plan_operations(current_user.id, plan)
+    if not operations:
+        return CalendarPlanResult(matched=0, modified=0, upserted=0)
+    try:
+        result = await db.calendar.bulk_write(operations, ordered=True)
+    except BulkWriteError as e:
+        # Przy `ordered=True` zapis zatrzymuje się na pierwszym błędzie - dzień z błędem i kolejne
+        # (niezmienione) zwracamy w `failed`, a wcześniejsze zmiany zostają
+        event_hub.publish(current_user.id, changed_event())
+        errors = e.details.get("writeErrors", [])
+        first = errors[0]["index"] if errors else 0
+        return CalendarPlanResult(matched=e.details.get("nMatched", 0), modified=e.details.get("nModified", 0),
+                                  upserted=e.details.get("nUpserted", 0), failed=sorted(set(days[first:])))
+    event_hub.publish(current_user.id, changed_event())
+    return CalendarPlanResult(matched=result.matched_count, modified=result.modified_count,
+                              upserted=result.upserted_count)
+
+
+@router.delete("/calendar/plan", response_model=CalendarPlanResult)
+async def delete_calendar_plan(
+        plan: CalendarPlanDelete,
+        db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+        current_user=Depends(get_current_user),
+):
+    """
+    Usuwa ćwiczenia planu z dni w zakresie dat (wszystkie albo tylko z podanych godzin); kroki zostają.
+    """
+    days = plan_days(plan.startDate, plan.stopDate)
+    result = await db.calendar.update_many(
+        {"user_id": current_user.id, "date": {"$gte": day_start(days[0]), "$lte": day_start(days[-1])},
+         **delete_plan_filter(plan)},
+        touch(delete_plan_update(plan)),
+    )
+    event_hub.publish(current_user.id, changed_event())
+    return CalendarPlanResult(matched=result.matched_count, modified=result.modified_count, upserted=0)
+
+
+async def day_response(db: AsyncIOMotorDatabase, doc: dict, response: Response, if_none_match: Optional[str],
+                       expand: Optional[str]):
+    """
+    Odpowiedź z jednym dniem kalendarza i jego ETagiem (numer wersji dnia).
+
+    Klient, który ma już tę wersję (If-None-Match), dostaje 304 bez ciała - bez rozwijania ćwiczeń i serializacji.
+    """
+    headers = {"ETag": day_etag(doc), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if expand == "exercise":
+        await expand_exercises(db, [doc])
+    if FAST_RESPONSES:
+        return fast_response(calendar_item(doc), CalendarResponse, headers=headers)
+    response.headers.update(headers)
+    doc["id"] = str(doc["_id"])
+    return CalendarResponse(**doc)
 
 
 @router.get("/calendar/{calendar_id}", response_model=CalendarResponse)
 async def get_calendar_entry(
+    response: Response,
     db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
     calendar_id: str = Path(..., description="ID wpisu kalendarza"),
     current_user=Depends(get_current_user),
+    expand: Optional[Literal["exercise"]] = Query(None, description="Dołącz dane ćwiczeń z katalogu"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    doc = await db.calendar.find_one({"_id": ObjectId(calendar_id), "user_id": current_user.id})
+    doc = await db.calendar.find_one(calendar_id_filter(calendar_id, current_user.id))
     if not doc:
         raise HTTPException(status_code=404, detail="Calendar entry not found")
-    doc["id"] = str(doc["_id"])
-    return CalendarResponse(**doc)
+    return await day_response(db, doc, response, if_none_match, expand)
+
+
+async def move_calendar_day(db: AsyncIOMotorDatabase, query: dict, if_match: Optional[str], update: dict):
+    """
+    Przenosi dzień pod nowe `_id`, gdy zmiana daty unieważnia deterministyczne "<user_id>:<YYYYMMDD>".
+
+    Nowy dokument jest wstawiany przed usunięciem starego (inna data, więc bez kolizji indeksów), a stary
+    jest usuwany tylko w odczytanej wersji - równoległa zmiana cofa przeniesienie i kończy się błędem 412.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        query (dict): Filtr dnia z `calendar_id_filter`.
+        if_match (str): Nagłówek If-Match z żądania.
+        update (dict): Aktualizacja dnia (z `touch`), zawierająca `$set.date`.
+
+    Raises:
+        HTTPException: 404/412 jak przy zwykłym zapisie, 400, jeśli dzień o nowej dacie już istnieje.
+
+    Returns:
+        dict: Dokument dnia po przeniesieniu albo None, jeśli `_id` nie zależy od daty (zwykły zapis).
+    """
+    before = await db.calendar.find_one(version_filter(query, if_match))
+    if before is None:
+        await raise_write_failed(db.calendar, query, if_match)
+    new_id = day_id(before["user_id"], update["$set"]["date"])
+    if not isinstance(before["_id"], str) or before["_id"] == new_id:
+        return None
+
+    doc = {**apply_update(before, update), "_id": new_id}
+    with check_day(doc["date"]):
+        await db.calendar.insert_one(doc)
+    deleted = await db.calendar.delete_one({"_id": before["_id"], "version": before.get("version")})
+    if deleted.deleted_count == 0:
+        await db.calendar.delete_one({"_id": new_id})
+        await raise_write_failed(db.calendar, query, day_etag(before))
+    await record_tombstone(db, "calendar", before["_id"], before["user_id"])
+    await update_rollups(db, before["user_id"], before, doc)
+    event_hub.publish(before["user_id"], deleted_event(before["_id"]))
+    event_hub.publish(before["user_id"], day_event(doc))
+    return doc
 
 
 @router.put("/calendar/{calendar_id}", response_model=CalendarResponse)
 async def update_calendar_entry(
     calendar_id: str,
     calendar_data: CalendarCreate,
+    response: Response,
     db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
     current_user=Depends(get_current_user),
+    if_match: Optional[str] = Header(None, description="ETag dnia - zapis tylko, jeśli nikt go w międzyczasie nie zmienił"),
 ):
     updated_data = {k: v for k, v in calendar_data.model_dump().items() if v is not None}
-    result = await db.calendar.update_one(
-        {"_id": ObjectId(calendar_id), "user_id": current_user.id},
-        {"$set": updated_data}
-    )
+    update = touch({"$set": updated_data})
+    query = calendar_id_filter(calendar_id, current_user.id)
+    if CALENDAR_ID_MODE == "day" and "date" in updated_data:
+        moved = await move_calendar_day(db, query, if_match, update)
+        if moved is not None:
+            response.headers["ETag"] = day_etag(moved)
+            moved["id"] = str(moved["_id"])
+            return CalendarResponse(**moved)
+    with check_day(calendar_data.date):
+        before = await db.calendar.find_one_and_update(
+            version_filter(query, if_match),
+            update,
+            return_document=ReturnDocument.BEFORE,
+        )
 
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Calendar entry not found")
+    if before is None:
+        await raise_write_failed(db.calendar, query, if_match)
 
-    # Pobierz zaktualizowany wpis
-    doc = await db.calendar.find_one({"_id": ObjectId(calendar_id)})
+    # Stan po zapisie odtwarzamy lokalnie - bez ponownego odczytu
+    doc = apply_update(before, update)
+    await update_rollups(db, current_user.id, before, doc)
+    event_hub.publish(current_user.id, day_event(doc))
+    response.headers["ETag"] = day_etag(doc)
     doc["id"] = str(doc["_id"])
     return CalendarResponse(**doc)
 
@@ -83,192 +324,326 @@ async def delete_calendar_entry(
     calendar_id: str,
     db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
     current_user=Depends(get_current_user),
+    if_match: Optional[str] = Header(None, description="ETag dnia - usunięcie tylko aktualnej wersji"),
 ):
-    result = await db.calendar.delete_one({"_id": ObjectId(calendar_id), "user_id": current_user.id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Calendar entry not found")
+    query = calendar_id_filter(calendar_id, current_user.id)
+    deleted = await db.calendar.find_one_and_delete(version_filter(query, if_match))
+    if deleted is None:
+        await raise_write_failed(db.calendar, query, if_match)
+    await record_tombstone(db, "calendar", deleted["_id"], current_user.id)
+    await update_rollups(db, current_user.id, deleted, None)
+    event_hub.publish(current_user.id, deleted_event(deleted["_id"]))
 
 
 @router.get("/calendar/date/date}", response_model=CalendarResponse)
 async def get_calendar_entry(
         date: datetime,
+    response: Response,
     db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
-    current_user=Depends(get_current_user)
+    current_user=Depends(get_current_user),
+    expand: Optional[Literal["exercise"]] = Query(None, description="Dołącz dane ćwiczeń z katalogu"),
+    if_none_match: Optional[str] = Header(None),
 ):
     day = date
 
     # Pobierz dokument
-    result = await db.calendar.find_one(
-        {"date": day, "user_id": current_user.id}
-    )
+    result = await db.calendar.find_one(day_filter(current_user.id, day))
     if not result:
         raise HTTPException(status_code=404, detail="Calendar entry not found")
-
-    # Przygotuj odpowiedź
-    result["id"] = str(result["_id"])
-    return CalendarResponse(**result)
+    return await day_response(db, result, response, if_none_match, expand)
 
 @router.get("/steps/today", response_model=StepsResponse)
 async def get_steps_today(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
     current_user=Depends(get_current_user),):
     date = today()
-    result = await db.calendar.find_one({"date": date, "user_id": current_user.id})
+    result = await db.calendar.find_one(day_filter(current_user.id, date))
     if not result:
         raise HTTPException(status_code=404, detail="Brak danych dla dzisiejszego dnia")
     return StepsResponse(steps=result["steps"], maxSteps=result["maxSteps"])
 
-###########
+async def upsert_day(db: AsyncIOMotorDatabase, user_id: str, day: datetime, update: dict) -> dict:
+    """
+    Atomowo aktualizuje dzień użytkownika, tworząc go jeśli jeszcze nie istnieje.
+
+    Jedno `find_one_and_update` z `upsert=True` zastępuje odczyt, zapis i ponowny odczyt,
+    a unikalny indeks (user_id, date) chroni przed zduplikowanymi dniami przy równoległych zapisach.
+    Pobieramy stan sprzed zmiany, żeby przenieść różnicę na zestawienia `steps_rollups`.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        user_id (str): ID użytkownika.
+        day (datetime): Dzień, którego dotyczy zapis.
+        update (dict): Operatory aktualizacji ($set, $inc, $setOnInsert...).
+
+    Returns:
+        dict: Dokument dnia po aktualizacji.
+    """
+    query = day_filter(user_id, day)
+    update = touch(update)
+    on_insert = day_insert_fields(user_id, day)
+    if on_insert:
+        update = {**update, "$setOnInsert": {**update.get("$setOnInsert", {}), **on_insert}}
+    before = await db.calendar.find_one_and_update(
+        query,
+        update,
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    after = apply_update(before or query, update, inserted=before is None)
+    await update_rollups(db, user_id, before, after)
+    event_hub.publish(user_id, day_event(after))
+    return after
+
 @router.put("/steps/today", response_model=StepsResponse)
 async def put_steps_today(
         steps: StepsUpdate,
         db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
         current_user=Depends(get_current_user),
+        delta: bool = Query(False, description="Dodaj kroki do zapisanej wartości zamiast ją nadpisywać"),
 ):
-    date = today()
-    result = await db.calendar.find_one({"date": date, "user_id": current_user.id})
-
-    if not result:
-        # Utworzenie nowego wpisu z zachowaniem domyślnego maxSteps
-        calendar_data = CalendarCreate(
-            date=date,
-            steps=steps.steps,
-            maxSteps=10000  # domyślna wartość
-        )
-        result = await create_calendar_entry(calendar_data, db, current_user)
-        return StepsResponse(steps=result.steps, maxSteps=result.maxSteps)
-
-    # Aktualizacja tylko kroków, zachowując istniejący maxSteps
-    await db.calendar.update_one(
-        {"date": date, "user_id": current_user.id},
-        {"$set": {"steps": steps.steps}}
-    )
-
-    updated_result = await db.calendar.find_one({"date": date, "user_id": current_user.id})
-    return StepsResponse(steps=updated_result["steps"], maxSteps=updated_result["maxSteps"])
+    if delta:
+        update = {"$inc": {"steps": steps.steps or 0}}
+    else:
+        update = {"$set": {"steps": steps.steps}}
+    # Nowy dzień dostaje domyślny maxSteps, istniejący zachowuje swój
+    update["$setOnInsert"] = {"maxSteps": DEFAULT_MAX_STEPS, "exercises": []}
+
+    result = await upsert_day(db, current_user.id, today(), update)
+    return StepsResponse(steps=result["steps"], maxSteps=result["maxSteps"])
 
 @router.put("/steps/today/goal", response_model=StepsResponse)
-async def put_steps_today(
+async def put_steps_today_goal(
         steps: StepsGoalUpdate,
         db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
         current_user=Depends(get_current_user),
 ):
-    date = today()
-    result = await db.calendar.find_one({"date": date, "user_id": current_user.id})
-
-    if not result:
-        # Utworzenie nowego wpisu z zachowaniem domyślnego maxSteps
-        calendar_data = CalendarCreate(
-            date=date,
-            steps=0,    # domyślna wartość
-            maxSteps=steps.maxSteps
-        )
-        result = await create_calendar_entry(calendar_data, db, current_user)
-        return StepsResponse(steps=result.steps, maxSteps=result.maxSteps)
-
-    # Aktualizacja tylko kroków, zachowując istniejący maxSteps
-    await db.calendar.update_one(
-        {"date": date, "user_id": current_user.id},
-        {"$set": {"maxSteps": steps.maxSteps}}
-    )
+    update = {
+        "$set": {"maxSteps": steps.maxSteps},
+        "$setOnInsert": {"steps": 0, "exercises": []},
+    }
 
-    updated_result = await db.calendar.find_one({"date": date, "user_id": current_user.id})
-    return StepsResponse(steps=updated_result["steps"], maxSteps=updated_result["maxSteps"])
+    result = await upsert_day(db, current_user.id, today(), update)
+    return StepsResponse(steps=result["steps"], maxSteps=result["maxSteps"])
 
-@router.get("/steps/history", response_model=List[StepsHistoryResponse])
+@router.post("/steps/batch", response_model=List[StepsBatchResult])
+async def put_steps_batch(
+        items: List[StepsBatchItem],
+        db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+        current_user=Depends(get_current_user),
+):
+    """
+    Zapisuje kroki z wielu dni (np. po tygodniu offline) jednym `bulk_write`.
+
+    Każdy element to upsert dnia; `ordered=False` sprawia, że błąd jednego dnia nie blokuje pozostałych.
+    Stan dni sprzed zapisu jest czytany jednym zapytaniem, więc przyrosty zestawień liczymy jak przy
+    zapisie jednego dnia - bez zapytania na każdy dzień paczki.
+    """
+    if len(items) > STEPS_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {STEPS_BATCH_MAX_ITEMS} items)")
+    if not items:
+        return []
+
+    days = [day_start(item.date) for item in items]
+    current = {
+        doc["date"]: doc
+        async for doc in db.calendar.find({"user_id": current_user.id, "date": {"$in": days}})
+    }
+
+    queries, updates, operations = [], [], []
+    for item, day in zip(items, days):
+        to_set = {}
+        if item.steps is not None:
+            to_set["steps"] = item.steps
+        if item.maxSteps is not None:
+            to_set["maxSteps"] = item.maxSteps
+        for sample in item.hours or []:
+            to_set[f"hourlySteps.{sample.hour:02d}"] = sample.steps
+
+        on_insert = {"exercises": [], **day_insert_fields(current_user.id, day)}
+        if "steps" not in to_set:
+            on_insert["steps"] = 0
+        if "maxSteps" not in to_set:
+            on_insert["maxSteps"] = DEFAULT_MAX_STEPS
+
+        queries.append(day_filter(current_user.id, day))
+        updates.append(touch({"$set": to_set, "$setOnInsert": on_insert}))
+        operations.append(UpdateOne(queries[-1], updates[-1], upsert=True))
+
+    errors = {}
+    try:
+        result = await db.calendar.bulk_write(operations, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        upserted = {op["index"]: op["_id"] for op in e.details.get("upserted", [])}
+        errors = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+
+    # Przyrosty zestawień z par przed/po; kolejne wpisy tego samego dnia widzą stan po poprzednich
+    rollup_updates, results = [], []
+    for index, (item, day) in enumerate(zip(items, days)):
+        if index in errors:
+            results.append(StepsBatchResult(date=item.date, status="error", error=errors[index]))
+            continue
+        before = current.get(day)
+        after = apply_update(before or queries[index], updates[index], inserted=before is None)
+        rollup_updates.extend(rollup_operations(current_user.id, before, after))
+        current[day] = after
+        results.append(StepsBatchResult(date=item.date, status="created" if index in upserted else "updated"))
+
+    if rollup_updates:
+        await db.steps_rollups.bulk_write(rollup_updates, ordered=False)
+    event_hub.publish(current_user.id, changed_event())
+    return results
+
+@router.get("/steps/history", response_model=Page[StepsHistoryResponse])
 async def get_steps_history(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
-    current_user=Depends(get_current_user),):
-    history = []
-    cursor = db.calendar.find(
-        {"user_id": current_user.id},
-        {"date": 1, "steps": 1, "_id": 0}
+    current_user=Depends(get_current_user),
+    date_from: Optional[date] = Query(None, alias="from", description="Pierwszy dzień zakresu"),
+    date_to: Optional[date] = Query(None, alias="to", description="Ostatni dzień zakresu"),
+    cursor: Optional[str] = Query(None, description="Kursor z poprzedniej strony (next_cursor)"),
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),):
+    docs, next_cursor = await paginate(
+        db.calendar, calendar_query(current_user.id, date_from, date_to), CALENDAR_SORT, cursor, limit,
+        projection={"date": 1, "steps": 1, "_id": 1},
     )
+    if FAST_RESPONSES:
+        return fast_response({"items": [steps_history_item(doc) for doc in docs], "next_cursor": next_cursor},
+                             Page[StepsHistoryResponse])
+    history = [StepsHistoryResponse(**doc) for doc in docs]
+    return Page(items=history, next_cursor=next_cursor)
 
-    async for doc in cursor:
-        history.append(StepsHistoryResponse(**doc))
-    return history
+
+@router.get("/steps/summary", response_model=List[StepsSummaryResponse])
+async def get_steps_summary(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+    current_user=Depends(get_current_user),
+    granularity: Literal["week", "month"] = Query("week"),
+    date_from: Optional[date] = Query(None, alias="from", description="Pierwszy dzień zakresu"),
+    date_to: Optional[date] = Query(None, alias="to", description="Ostatni dzień zakresu"),):
+    # Odczyt gotowych zestawień - rok to 52 (lub 12) dokumenty zamiast 365 dni
+    query = {"user_id": current_user.id, "granularity": granularity}
+    start_condition = {}
+    if date_from is not None:
+        start_condition["$gte"] = day_start(period_start(date_from, granularity))
+    if date_to is not None:
+        start_condition["$lte"] = day_start(date_to)
+    if start_condition:
+        query["start"] = start_condition
+
+    summary = []
+    async for doc in db.steps_rollups.find(query).sort("start", 1):
+        if not doc.get("days"):
+            continue
+        summary.append(StepsSummaryResponse(
+            period=doc["period"], start=doc["start"].date(), sum=doc["sum"], avg=doc["sum"] / doc["days"],
+            max=doc.get("max"), days=doc["days"], goalHits=doc["goalHits"],
+        ))
+    return summary
 
 
 @router.post("/calendar/{calendar_id}/exercise", response_model=ExercisePerformanceResponse)
 async def add_exercise_to_calendar(
         calendar_id: str,
         exercise: ExercisePerformanceCreate,
+        response: Response,
         db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
         current_user=Depends(get_current_user),
+        if_match: Optional[str] = Header(None, description="ETag dnia - zapis tylko, jeśli nikt go w międzyczasie nie zmienił"),
 ):
-    # Sprawdź czy wpis kalendarza istnieje
-    calendar = await db.calendar.find_one({"_id": ObjectId(calendar_id), "user_id": current_user.id})
-    if not calendar:
-        raise HTTPException(status_code=404, detail="Calendar entry not found")
-
     # Utwórz nowy obiekt ćwiczenia z ID
     exercise_id = str(ObjectId())
     exercise_with_id = {**exercise.model_dump(), "id": exercise_id}
 
-    # Dodaj ćwiczenie do listy
-    result = await db.calendar.update_one(
-        {"_id": ObjectId(calendar_id)},
-        {"$push": {"exercises": exercise_with_id}}
+    # Dodaj ćwiczenie do listy - brak dnia (lub inna wersja) oznacza brak dopasowania
+    query = calendar_id_filter(calendar_id, current_user.id)
+    calendar = await db.calendar.find_one_and_update(
+        version_filter(query, if_match),
+        touch({"$push": {"exercises": exercise_with_id}}),
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER,
     )
+    if calendar is None:
+        await raise_write_failed(db.calendar, query, if_match)
+    event_hub.publish(current_user.id, changed_event(calendar["_id"], calendar["version"]))
 
+    response.headers["ETag"] = day_etag(calendar)
     return ExercisePerformanceResponse(**exercise_with_id)
 
 
+@router.patch("/calendar/{calendar_id}/exercises", response_model=CalendarResponse)
+async def patch_calendar_exercises(
+        calendar_id: str,
+        operations: List[ExerciseOperation],
+        response: Response,
+        db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+        current_user=Depends(get_current_user),
+        if_match: Optional[str] = Header(None, description="ETag dnia - zapis tylko, jeśli nikt go w międzyczasie nie zmienił"),
+):
+    """
+    Wykonuje listę operacji na ćwiczeniach dnia (add, update, remove, done) jednym zapisem.
+
+    Wszystkie operacje trafiają do jednego `find_one_and_update`, więc dzień zmienia się atomowo:
+    albo wszystkie, albo żadna (np. gdy któraś pozycja nie istnieje - 404). Zwraca dzień po zmianie.
+    """
+    pipeline, targets = exercise_patch(operations)
+    query = calendar_id_filter(calendar_id, current_user.id)
+    if targets:
+        query["exercises.id"] = {"$all": targets}
+    doc = await db.calendar.find_one_and_update(
+        version_filter(query, if_match),
+        pipeline,
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        await raise_write_failed(db.calendar, query, if_match, "Calendar entry or exercise not found")
+    event_hub.publish(current_user.id, day_event(doc))
+    return await day_response(db, doc, response, None, None)
+
+
 @router.put("/calendar/{calendar_id}/exercise/{exercise_id}", response_model=ExercisePerformanceResponse)
 async def update_exercise_in_calendar(
         calendar_id: str,
         exercise_id: str,
         exercise: ExercisePerformanceCreate,
+        response: Response,
         db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
         current_user=Depends(get_current_user),
+        if_match: Optional[str] = Header(None, description="ETag dnia - zapis tylko, jeśli nikt go w międzyczasie nie zmienił"),
 ):
-    # Sprawdź czy wpis kalendarza istnieje
-    calendar = await db.calendar.find_one({
-        "_id": ObjectId(calendar_id),
-        "user_id": current_user.id,
-        "exercises.id": exercise_id
-    })
-    if not calendar:
-        raise HTTPException(status_code=404, detail="Calendar entry or exercise not found")
-
-    # Aktualizuj ćwiczenie w tablicy
+    # Aktualizuj ćwiczenie w tablicy i od razu pobierz jego nowy stan (tylko ten element tablicy)
+    query = {**calendar_id_filter(calendar_id, current_user.id), "exercises.id": exercise_id}
     update_data = {f"exercises.$.{k}": v for k, v in exercise.model_dump().items() if v is not None}
-    result = await db.calendar.update_one(
-        {
-            "_id": ObjectId(calendar_id),
-            "exercises.id": exercise_id
-        },
-        {"$set": update_data}
+    updated_calendar = await db.calendar.find_one_and_update(
+        version_filter(query, if_match),
+        touch({"$set": update_data}),
+        projection={"version": 1, "exercises": {"$elemMatch": {"id": exercise_id}}},
+        return_document=ReturnDocument.AFTER,
     )
+    if updated_calendar is None:
+        await raise_write_failed(db.calendar, query, if_match, "Calendar entry or exercise not found")
 
-    # Pobierz zaktualizowany dokument
-    updated_calendar = await db.calendar.find_one({
-        "_id": ObjectId(calendar_id),
-        "exercises.id": exercise_id
-    })
-    updated_exercise = next(ex for ex in updated_calendar["exercises"] if ex["id"] == exercise_id)
-
-    return ExercisePerformanceResponse(**updated_exercise)
+    event_hub.publish(current_user.id, changed_event(updated_calendar["_id"], updated_calendar["version"]))
+    response.headers["ETag"] = day_etag(updated_calendar)
+    return ExercisePerformanceResponse(**updated_calendar["exercises"][0])
 
 
 @router.delete("/calendar/{calendar_id}/exercise/{exercise_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_exercise_from_calendar(
         calendar_id: str,
         exercise_id: str,
+        response: Response,
         db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
         current_user=Depends(get_current_user),
+        if_match: Optional[str] = Header(None, description="ETag dnia - usunięcie tylko z aktualnej wersji"),
 ):
-    # Sprawdź czy wpis kalendarza istnieje
-    calendar = await db.calendar.find_one({
-        "_id": ObjectId(calendar_id),
-        "user_id": current_user.id,
-        "exercises.id": exercise_id
-    })
-    if not calendar:
-        raise HTTPException(status_code=404, detail="Calendar entry or exercise not found")
-
-    # Usuń ćwiczenie z tablicy
-    result = await db.calendar.update_one(
-        {"_id": ObjectId(calendar_id)},
-        {"$pull": {"exercises": {"id": exercise_id}}}
+    # Usuń ćwiczenie z tablicy - filtr po `exercises.id` zastępuje osobne sprawdzenie istnienia
+    query = {**calendar_id_filter(calendar_id, current_user.id), "exercises.id": exercise_id}
+    calendar = await db.calendar.find_one_and_update(
+        version_filter(query, if_match),
+        touch({"$pull": {"exercises": {"id": exercise_id}}}),
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER,
     )
+    if calendar is None:
+        await raise_write_failed(db.calendar, query, if_match, "Calendar entry or exercise not found")
+    event_hub.publish(current_user.id, changed_event(calendar["_id"], calendar["version"]))
+    response.headers["ETag"] = day_etag(calendar)
 
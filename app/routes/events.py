@@ -0,0 +1,58 @@
+import asyncio
+from typing import Annotated
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.auth import get_current_user
+from app.database import get_db
+from app.config import EVENTS_HEARTBEAT_SECONDS
+from app.utils.calendar_ids import day_filter
+from app.utils.events import event_hub, day_event
+from app.utils.serialization import dumps
+from app.utils.tools import today
+
+router = APIRouter()
+
+
+def sse_message(event: dict) -> bytes:
+    """Formatuje zdarzenie jako wiadomość Server-Sent Events (typ w polu `event`, JSON w `data`)."""
+    return b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
+
+
+async def event_stream(db: AsyncIOMotorDatabase, user_id: str):
+    """
+    Strumień SSE jednego połączenia: stan dzisiejszego dnia, potem zdarzenia z bufora i co
+    EVENTS_HEARTBEAT_SECONDS komentarz podtrzymujący połączenie (proxy nie zamyka bezczynnego strumienia).
+    """
+    # Subskrypcja przed odczytem - zmiana w trakcie odczytu przyjdzie jako zdarzenie, a nie zginie
+    subscription = event_hub.subscribe(user_id)
+    try:
+        doc = await db.calendar.find_one(day_filter(user_id, today()))
+        if doc:
+            yield sse_message(day_event(doc))
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            yield sse_message(event)
+    finally:
+        # Rozłączenie klienta przerywa generator - bufor połączenia znika z huba
+        event_hub.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def stream_events(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+                        current_user=Depends(get_current_user)):
+    """
+    Zmiany kroków i kalendarza zalogowanego użytkownika na żywo (Server-Sent Events) zamiast odpytywania.
+
+    Zdarzenia: `day` (pełny stan dnia), `changed` (dzień lub kilka dni zmienione - pobierz dzień po ID
+    albo GET /sync; to samo po przepełnieniu bufora) i `deleted`. Pierwsze zdarzenie to stan dzisiejszego dnia.
+    """
+    return StreamingResponse(
+        event_stream(db, current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,31 +1,49 @@
-from typing import List
+import time
+import mimetypes
+from datetime import datetime
+from typing import List, Optional, Literal
 from bson import ObjectId
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from pymongo import ReturnDocument
 from app.database import get_db
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.models import ExerciseInDB
 from app.utils import ExerciseType, Difficulty
-from app.utils.tools import check_exercise
+from app.utils.tools import check_exercise, etag_matches
+from app.utils.catalog import exercise_catalog
+from app.utils.invalidation import cache_versions
+from app.utils.sync import record_tombstone
 from app.schemas import (
-    ExerciseCreate, ExerciseResponse, ExerciseUpdate
+    ExerciseCreate, ExerciseResponse, ExerciseUpdate, ExerciseSearchResponse, ExerciseSuggestion,
+    MediaJobResponse
 )
+from app.config import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, UPLOAD_PART_SIZE, MAX_VIDEO_SIZE
+from app.storage import StorageBackend, get_storage, fixed_size_chunks, parse_range
 from app.auth import get_current_user
+from app.media import media_jobs
 
 router = APIRouter()
 
 @router.post("/exercise", response_model=ExerciseResponse)
 async def add_exercise(exercise: ExerciseCreate, db: Annotated[AsyncIOMotorDatabase, Depends(get_db)], current_user=Depends(get_current_user)):
-    await check_exercise(exercise.name, db)
     new_exercise = ExerciseInDB(**exercise.model_dump())
-    result = await db.exercises.insert_one(new_exercise.model_dump(exclude={"id"}))
+    with check_exercise(exercise.name):
+        result = await db.exercises.insert_one({**new_exercise.model_dump(exclude={"id"}), "updated_at": datetime.utcnow()})
+    await cache_versions.publish(db, "exercises")
 
     return ExerciseResponse(id=str(result.inserted_id), **exercise.model_dump())
 
 @router.get("/exercises", response_model=List[ExerciseResponse])
-async def list_exercises(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)], current_user=Depends(get_current_user)):
-    exercises = await db.exercises.find().to_list(length=100)
-    return [ExerciseResponse(id=str(ex["_id"]), **{k: ex[k] for k in ExerciseCreate.model_fields.keys()}) for ex in exercises]
+async def list_exercises(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)], current_user=Depends(get_current_user),
+                         if_none_match: Optional[str] = Header(None)):
+    # Cały katalog z gotowego obrazu w pamięci; klient z aktualnym ETagiem dostaje 304
+    snapshot = await exercise_catalog.get(db)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 @router.get("/exercises/types", response_model=List[str])
 async def list_exercises_types(current_user=Depends(get_current_user)):
@@ -37,12 +55,74 @@ async def list_exercises_difficulties(current_user=Depends(get_current_user)):
     exercises_difficulties = [et.value for et in Difficulty]
     return exercises_difficulties
 
+@router.get("/exercises/search", response_model=ExerciseSearchResponse)
+async def search_exercises(
+    db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+    current_user=Depends(get_current_user),
+    q: Optional[str] = Query(None, description="Szukany tekst w nazwie lub opisie"),
+    exerciseType: Optional[ExerciseType] = Query(None),
+    difficulty: Optional[Difficulty] = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+):
+    """
+    Wyszukuje ćwiczenia (indeks tekstowy + filtry) i zwraca liczności dla każdej wartości typu i trudności.
+
+    Wszystko liczone jest jedną agregacją z `$facet`. Liczności danego filtra uwzględniają
+    pozostałe filtry, ale nie jego samego - tak, by klient widział, ile da zmiana wyboru.
+    """
+    type_filter = {"exerciseType": exerciseType.value} if exerciseType else {}
+    difficulty_filter = {"difficulty": difficulty.value} if difficulty else {}
+
+    pipeline = []
+    if q:
+        pipeline.append({"$match": {"$text": {"$search": q}}})
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+        sort = {"score": -1, "_id": 1}
+    else:
+        sort = {"name": 1, "_id": 1}
+    pipeline.append({"$facet": {
+        "items": [{"$match": {**type_filter, **difficulty_filter}}, {"$sort": sort},
+                  {"$skip": offset}, {"$limit": limit}],
+        "total": [{"$match": {**type_filter, **difficulty_filter}}, {"$count": "count"}],
+        "exerciseType": [{"$match": difficulty_filter}, {"$group": {"_id": "$exerciseType", "count": {"$sum": 1}}}],
+        "difficulty": [{"$match": type_filter}, {"$group": {"_id": "$difficulty", "count": {"$sum": 1}}}],
+    }})
+
+    result = (await db.exercises.aggregate(pipeline).to_list(length=1))[0]
+    facets = {
+        "exerciseType": {et.value: 0 for et in ExerciseType},
+        "difficulty": {d.value: 0 for d in Difficulty},
+    }
+    for facet in facets:
+        for bucket in result[facet]:
+            if bucket["_id"] in facets[facet]:
+                facets[facet][bucket["_id"]] = bucket["count"]
+
+    return ExerciseSearchResponse(
+        items=[ExerciseResponse(id=str(ex["_id"]), **{k: ex.get(k) for k in ExerciseResponse.model_fields.keys() if k != "id"})
+               for ex in result["items"]],
+        total=result["total"][0]["count"] if result["total"] else 0,
+        facets=facets,
+    )
+
+@router.get("/exercises/autocomplete", response_model=List[ExerciseSuggestion])
+async def autocomplete_exercises(
+    db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+    current_user=Depends(get_current_user),
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+):
+    # Podpowiedzi z indeksu prefiksowego w pamięci - bez zapytania do bazy, gdy katalog jest w cache
+    snapshot = await exercise_catalog.get(db)
+    return snapshot.prefix_index.search(prefix, limit)
+
 @router.get("/exercise/{exercise_id}", response_model=ExerciseResponse)
 async def get_exercise(exercise_id: str,db: Annotated[AsyncIOMotorDatabase, Depends(get_db)], current_user=Depends(get_current_user)):
     exercise = await db.exercises.find_one({"_id": ObjectId(exercise_id)})
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
-    return ExerciseResponse(id=str(exercise["_id"]), **{k: exercise[k] for k in ExerciseCreate.model_fields.keys()})
+    return ExerciseResponse(id=str(exercise["_id"]), **{k: exercise.get(k) for k in ExerciseResponse.model_fields.keys() if k != "id"})
 
 @router.put("/exercise/{exercise_id}", response_model=ExerciseResponse)
 async def update_exercise(exercise_id: str, update: ExerciseCreate, db: Annotated[AsyncIOMotorDatabase, Depends(get_db)], current_user=Depends(get_current_user)):
@@ -50,7 +130,10 @@ async def update_exercise(exercise_id: str, update: ExerciseCreate, db: Annotate
     if not existing:
         raise HTTPException(status_code=404, detail="Exercise not found")
 
-    await db.exercises.update_one({"_id": ObjectId(exercise_id)}, {"$set": update.model_dump()})
+    with check_exercise(update.name):
+        await db.exercises.update_one({"_id": ObjectId(exercise_id)},
+                                      {"$set": {**update.model_dump(), "updated_at": datetime.utcnow()}})
+    await cache_versions.publish(db, "exercises")
     updated = await db.exercises.find_one({"_id": ObjectId(exercise_id)})
     return ExerciseResponse(id=str(updated["_id"]), **{k: updated[k] for k in ExerciseCreate.model_fields.keys()})
 
@@ -59,4 +142,162 @@ async def delete_exercise(exercise_id: str,db: Annotated[AsyncIOMotorDatabase, D
     result = await db.exercises.delete_one({"_id": ObjectId(exercise_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Exercise not found")
-    return None
\ No newline at end of file
+    await record_tombstone(db, "exercise", exercise_id)
+    await cache_versions.publish(db, "exercises")
+    return None
+
+@router.put("/exercise/{exercise_id}/video", response_model=ExerciseResponse)
+async def upload_exercise_video(exercise_id: str, request: Request, db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+                                current_user=Depends(get_current_user),
+                                storage: StorageBackend = Depends(get_storage)):
+    """
+    Przyjmuje film ćwiczenia jako surowe ciało żądania i strumieniuje go do magazynu w kawałkach UPLOAD_PART_SIZE.
+
+    Plik nie jest buforowany w całości - zużycie pamięci nie zależy od jego rozmiaru. Miniatury
+    i lżejsza wersja filmu są generowane w tle (stan: GET /exercise/{id}/media-job).
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("video/"):
+        raise HTTPException(status_code=415, detail="Expected a video/* content type")
+    existing = await db.exercises.find_one({"_id": ObjectId(exercise_id)},
+                                           {"video_key": 1, "thumbnail_keys": 1, "rendition_key": 1})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+
+    extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+    key = f"exercises/{exercise_id}/video-{ObjectId()}{extension}"
+    size = await storage.put_stream(key, fixed_size_chunks(request.stream(), UPLOAD_PART_SIZE, MAX_VIDEO_SIZE),
+                                    content_type)
+
+    video = {
+        "video_url": f"/exercise/{exercise_id}/video",
+        "video_key": key,
+        "video_content_type": content_type,
+        "video_size": size,
+    }
+    # Miniatury i lżejsza wersja starego filmu przestają być aktualne - wygeneruje je zadanie w tle
+    updated = await db.exercises.find_one_and_update(
+        {"_id": ObjectId(exercise_id)},
+        {"$set": {**video, "updated_at": datetime.utcnow()}, "$unset": {"thumbnail_url": "", "thumbnail_keys": "", "rendition_key": ""}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        # Ćwiczenie usunięte w trakcie wysyłania
+        await storage.delete(key)
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    for old_key in [existing.get("video_key"), existing.get("rendition_key"),
+                    *(existing.get("thumbnail_keys") or {}).values()]:
+        if old_key:
+            await storage.delete(old_key)
+    await cache_versions.publish(db, "exercises")
+    await media_jobs.enqueue(db, storage, exercise_id, key)
+
+    return ExerciseResponse(id=str(updated["_id"]), **{k: updated.get(k) for k in ExerciseResponse.model_fields.keys() if k != "id"})
+
+@router.get("/exercise/{exercise_id}/video")
+async def get_exercise_video(exercise_id: str, db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+                             current_user=Depends(get_current_user),
+                             storage: StorageBackend = Depends(get_storage),
+                             range_header: Optional[str] = Header(None, alias="Range"),
+                             delivery: Literal["stream", "presigned"] = Query("stream"),
+                             quality: Literal["original", "low"] = Query("original")):
+    """
+    Udostępnia film ćwiczenia z obsługą nagłówka Range (odpowiedź 206), więc przewijanie nie pobiera pliku od początku.
+
+    W trybie `presigned` klient dostaje przekierowanie na krótkotrwały podpisany URL magazynu i pobiera
+    film bezpośrednio z MinIO. Magazyn lokalny wysyła plik przez FileResponse (sendfile, jeśli serwer to wspiera).
+    `quality=low` wybiera lżejszą wersję 480p, jeśli została już wygenerowana.
+    """
+    exercise = await db.exercises.find_one({"_id": ObjectId(exercise_id)},
+                                           {"video_key": 1, "video_content_type": 1, "video_size": 1,
+                                            "rendition_key": 1})
+    if not exercise:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    if not exercise.get("video_key"):
+        raise HTTPException(status_code=404, detail="Exercise has no video")
+    key = exercise["video_key"]
+    content_type = exercise.get("video_content_type") or "application/octet-stream"
+    if quality == "low" and exercise.get("rendition_key"):
+        key, content_type = exercise["rendition_key"], "video/mp4"
+        exercise["video_size"] = None
+
+    if delivery == "presigned":
+        presigned = await storage.presigned_url(key)
+        if presigned is not None:
+            url, expires_at = presigned
+            return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+                                    headers={"Cache-Control": f"private, max-age={max(int(expires_at - time.time()), 0)}"})
+
+    return await serve_object(storage, key, content_type, exercise.get("video_size"), range_header)
+
+@router.get("/exercise/{exercise_id}/thumbnail")
+async def get_exercise_thumbnail(exercise_id: str, db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+                                 current_user=Depends(get_current_user),
+                                 storage: StorageBackend = Depends(get_storage),
+                                 width: Optional[int] = Query(None, gt=0)):
+    """
+    Udostępnia miniaturę ćwiczenia wygenerowaną z filmu.
+
+    Bez `width` zwracana jest klatka tytułowa w pełnym rozmiarze, z `width` - najmniejsza
+    miniatura nie węższa niż żądana (lub największa dostępna).
+    """
+    exercise = await db.exercises.find_one({"_id": ObjectId(exercise_id)}, {"thumbnail_keys": 1})
+    if not exercise:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    keys = exercise.get("thumbnail_keys") or {}
+    if not keys:
+        raise HTTPException(status_code=404, detail="Exercise has no thumbnail")
+
+    key = keys.get("poster")
+    widths = sorted(int(variant) for variant in keys if variant.isdigit())
+    if width is not None and widths:
+        chosen = next((w for w in widths if w >= width), widths[-1])
+        key = keys[str(chosen)]
+    response = await serve_object(storage, key, "image/jpeg")
+    # Klucz miniatury zmienia się przy każdym nowym filmie, więc odpowiedź można długo trzymać w cache klienta
+    response.headers["Cache-Control"] = "private, max-age=86400"
+    return response
+
+@router.get("/exercise/{exercise_id}/media-job", response_model=MediaJobResponse)
+async def get_exercise_media_job(exercise_id: str, db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+                                 current_user=Depends(get_current_user)):
+    """Zwraca stan ostatniego zadania przetwarzania filmu ćwiczenia."""
+    job = await db.media_jobs.find_one({"exercise_id": exercise_id}, sort=[("created_at", -1)])
+    if not job:
+        raise HTTPException(status_code=404, detail="No media job for this exercise")
+    # Pola, których zadanie jeszcze nie ma (np. `attempts` przed pierwszym przejęciem), przyjmują wartości domyślne
+    fields = {k: job[k] for k in MediaJobResponse.model_fields.keys() if k != "id" and job.get(k) is not None}
+    return MediaJobResponse(id=str(job["_id"]), **fields)
+
+async def serve_object(storage: StorageBackend, key: str, content_type: str, size: int = None,
+                       range_header: str = None):
+    """
+    Wysyła obiekt z magazynu z obsługą nagłówka Range.
+
+    Args:
+        storage (StorageBackend): Magazyn plików.
+        key (str): Klucz obiektu.
+        content_type (str): Typ MIME odpowiedzi.
+        size (int, optional): Znany rozmiar obiektu (oszczędza zapytanie do magazynu).
+        range_header (str, optional): Wartość nagłówka Range.
+
+    Returns:
+        Response: FileResponse dla magazynu lokalnego, inaczej StreamingResponse (200 lub 206).
+    """
+    path = storage.local_path(key)
+    if path is not None:
+        # FileResponse sam obsługuje Range/206 i wysyła plik bez kopiowania przez Pythona, gdy serwer to umożliwia
+        return FileResponse(path, media_type=content_type)
+
+    if size is None:
+        size = await storage.size(key)
+    byte_range = parse_range(range_header, size)
+    headers = {"Accept-Ranges": "bytes"}
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, status.HTTP_200_OK
+    else:
+        (start, end), status_code = byte_range, status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(storage.get_range(key, start, end), status_code=status_code,
+                             media_type=content_type, headers=headers)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.database import ping_db
+
+router = APIRouter()
+
+
+@router.get("/health/live")
+async def health_live():
+    """Proces działa i obsługuje żądania (bez sprawdzania zależności)."""
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def health_ready():
+    """Aplikacja jest gotowa na ruch: MongoDB odpowiada na ping. W przeciwnym razie 503."""
+    if await ping_db():
+        return {"status": "ok", "mongo": "ok"}
+    return JSONResponse({"status": "unavailable", "mongo": "unreachable"}, status_code=503)
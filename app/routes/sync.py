@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime
+from typing import Optional, Annotated
+from fastapi import APIRouter, Depends, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.auth import get_current_user
+from app.database import get_db
+from app.config import SYNC_PAGE_LIMIT
+from app.schemas import SyncResponse
+from app.utils.serialization import fast_response, calendar_item, exercise_item
+from app.utils.sync import SYNC_SOURCES, decode_token, encode_token, token_expired, initial_positions, changes_page
+
+router = APIRouter()
+
+
+@router.get("/sync", response_model=SyncResponse)
+async def sync_changes(
+        db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+        current_user=Depends(get_current_user),
+        since: Optional[str] = Query(None, description="Token z poprzedniej synchronizacji (brak = pełna synchronizacja)"),
+):
+    """
+    Zwraca dni kalendarza i ćwiczenia z katalogu zmienione od `since` oraz ślady usunięć.
+
+    Klient zapisuje `token` i przekazuje go w kolejnym wywołaniu; przy `has_more` od razu pyta dalej.
+    `full` oznacza pełną synchronizację (brak tokenu albo token starszy niż SYNC_TOMBSTONE_TTL_DAYS) -
+    klient czyści wtedy lokalne dane przed zastosowaniem odpowiedzi. Usunięcia (`deleted`) stosuje się przed zmianami,
+    chyba że dokument o tym ID ma `updated_at` późniejsze niż `deleted_at` (dzień utworzony ponownie).
+    """
+    started = datetime.utcnow()
+    positions = decode_token(since) if since else None
+    full = positions is None or token_expired(positions, started)
+    if full:
+        positions = initial_positions(started)
+
+    user = current_user.id
+    (days, calendar_position, more_days), (exercises, exercises_position, more_exercises), \
+        (tombstones, tombstones_position, more_tombstones) = await asyncio.gather(
+            changes_page(db.calendar, {"user_id": user}, SYNC_SOURCES["calendar"], positions["calendar"],
+                         SYNC_PAGE_LIMIT, started),
+            changes_page(db.exercises, {}, SYNC_SOURCES["exercises"], positions["exercises"],
+                         SYNC_PAGE_LIMIT, started),
+            changes_page(db.tombstones, {"user_id": {"$in": [user, None]}}, SYNC_SOURCES["tombstones"],
+                         positions["tombstones"], SYNC_PAGE_LIMIT, started),
+        )
+
+    content = {
+        "calendar": [calendar_item(doc) for doc in days],
+        "exercises": [exercise_item(doc) for doc in exercises],
+        "deleted": [{"kind": doc["kind"], "id": doc["doc_id"], "deleted_at": doc["deleted_at"]} for doc in tombstones],
+        "token": encode_token({
+            "calendar": calendar_position, "exercises": exercises_position, "tombstones": tombstones_position,
+        }),
+        "has_more": more_days or more_exercises or more_tombstones,
+        "full": full,
+    }
+    return fast_response(content, SyncResponse)
@@ -1,20 +1,28 @@
-from typing import List
+from typing import List, Optional
+from datetime import date, timedelta
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.database import get_db
 from app.models import UserInDB
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Annotated
 from app.utils.security import check_role, check_email, check_id
-from app.schemas import UserCreate, UserResponse, TokenResponse, UserProfileResponse, UpdateUserProfile
+from app.schemas import UserCreate, UserResponse, TokenResponse, UserProfileResponse, UpdateUserProfile, Page
+from app.config import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, FAST_RESPONSES
+from app.utils.pagination import paginate
+from app.utils.serialization import fast_response, user_profile_item
+from app.utils.invalidation import cache_versions
+from app.utils.tools import day_start
 from app.auth import (
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
     create_access_token,
     create_refresh_token,
     verify_token,
-    get_current_user
+    get_current_user,
+    invalidate_user,
+    cache_stats
 )
 
 router = APIRouter()
@@ -32,15 +40,15 @@ async def register_user(user: UserCreate, db: Annotated[AsyncIOMotorDatabase, De
     Returns:
         UserResponse: The response with the newly registered user's username and email.
     """
-    await check_email(str(user.email), db)
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
     new_user = UserInDB(
         username=user.username,
         email=user.email,
         password=hashed_password
     )
 
-    await db.users.insert_one(new_user.model_dump())
+    with check_email(str(user.email)):
+        await db.users.insert_one(new_user.model_dump())
 
     return UserResponse(username=user.username, email=user.email)
 
@@ -58,9 +66,17 @@ async def login_user(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)], form_
         TokenResponse: The response containing access and refresh tokens.
     """
     db_user = await db.users.find_one({"email": form_data.username})
-    if not db_user or not verify_password(form_data.password, db_user["password"]):
+    if not db_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
+    # Verified in the bcrypt pool; a full queue fails fast with 503 + Retry-After
+    valid, new_hash = await verify_password_async(form_data.password, db_user["password"])
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash uses an outdated cost - rehash transparently on login
+        await db.users.update_one({"_id": db_user["_id"]}, {"$set": {"password": new_hash}})
+
     user_id = str(db_user["_id"])
     role = db_user.get("role", "user")  # Default to 'user' if no role is defined
 
@@ -113,7 +129,7 @@ async def refresh_token(refresh_token: str, db: Annotated[AsyncIOMotorDatabase,
         raise credentials_exception
 
     # Generate a new access token
-    access_token = create_access_token(data={"sub": user_id, "scopes": user["role"]})
+    access_token = create_access_token(data={"sub": user_id, "scopes": [user.get("role", "user")]})
 
     return TokenResponse(
         access_token=access_token, token_type="bearer"
@@ -137,29 +153,50 @@ async def get_me(current_user=Depends(get_current_user)):
     }
 
 
-@router.get("/user_profile", response_model=List[UserProfileResponse])
-async def user_profile(db: Annotated[AsyncIOMotorDatabase, Depends(get_db)], current_user: dict = Depends(get_current_user)):
+@router.get("/user_profile", response_model=Page[UserProfileResponse])
+async def user_profile(
+    db: Annotated[AsyncIOMotorDatabase, Depends(get_db)],
+    current_user: dict = Depends(get_current_user),
+    date_from: Optional[date] = Query(None, alias="from", description="Only users created on or after this day"),
+    date_to: Optional[date] = Query(None, alias="to", description="Only users created on or before this day"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page (next_cursor)"),
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+):
     """
-    Retrieves a list of all user profiles in the system. Only accessible by admins.
+    Retrieves a page of user profiles, ordered by ID. Only accessible by admins.
 
     Args:
         current_user (dict): The current authenticated user.
         db (Database): The database connection.
+        date_from (date, optional): Lower bound of the account creation day (taken from the ObjectId).
+        date_to (date, optional): Upper bound of the account creation day (taken from the ObjectId).
+        cursor (str, optional): Opaque cursor returned as `next_cursor` by the previous page.
+        limit (int): Maximum number of profiles in the page.
 
     Returns:
-        List[UserProfileResponse]: A list of user profiles.
+        Page[UserProfileResponse]: A page of user profiles and the cursor of the next page.
     """
     check_role(current_user, "admin")
 
-    # Fetch all users from the database
-    users_cursor = db.users.find()
-    users = await users_cursor.to_list(length=None)
+    # ObjectId embeds its creation time, so the date range maps onto an _id range
+    query = {}
+    if date_from is not None:
+        query.setdefault("_id", {})["$gte"] = ObjectId.from_datetime(day_start(date_from))
+    if date_to is not None:
+        query.setdefault("_id", {})["$lt"] = ObjectId.from_datetime(day_start(date_to + timedelta(days=1)))
+
+    users, next_cursor = await paginate(db.users, query, ("_id",), cursor, limit)
+
+    if FAST_RESPONSES:
+        # Skip building the models and the second validation pass of response_model
+        return fast_response({"items": [user_profile_item(user) for user in users], "next_cursor": next_cursor},
+                             Page[UserProfileResponse])
 
     # Create a response with a list of UserProfileResponse instances
     user_profiles = [UserProfileResponse(username=user["username"], email=user["email"], id=str(user["_id"]),
                                          role=user["role"]) for user in users]
 
-    return user_profiles
+    return Page(items=user_profiles, next_cursor=next_cursor)
 
 
 @router.get("/user_profile/{user_id}", response_model=UserProfileResponse)
@@ -238,13 +275,12 @@ async def create_user_profile(user: UpdateUserProfile, db: Annotated[AsyncIOMoto
     """
     check_role(current_user, "admin")
 
-    await check_email(str(user.email), db)
-
     # Create a new user with the provided data
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
     new_user = UserInDB(username=user.username, email=user.email, password=hashed_password, role=user.role)
 
-    result = await db.users.insert_one(new_user.model_dump())
+    with check_email(str(user.email)):
+        result = await db.users.insert_one(new_user.model_dump())
 
     return UserProfileResponse(
         username=user.username,
@@ -276,11 +312,14 @@ async def update_user_profile(user_id: str, user: UpdateUserProfile, db: Annotat
     updated_user = {
         "username": user.username,
         "email": user.email,
-        "password": hash_password(user.password),
+        "password": await hash_password_async(user.password),
         "role": user.role
     }
 
-    await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": updated_user})
+    with check_email(str(user.email)):
+        await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": updated_user})
+    invalidate_user(user_id)
+    await cache_versions.bump(db, "users")  # other workers drop their cached users
 
     return UserProfileResponse(
         username=user.username,
@@ -308,6 +347,8 @@ async def delete_user_profile(user_id: str, db: Annotated[AsyncIOMotorDatabase,
     existing_user = await check_id(str(user_id), db)
 
     delete_result = await db.users.delete_one({"_id": ObjectId(user_id)})
+    invalidate_user(user_id)
+    await cache_versions.bump(db, "users")  # other workers drop their cached users
     if delete_result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found or already deleted")
 
@@ -317,3 +358,18 @@ async def delete_user_profile(user_id: str, db: Annotated[AsyncIOMotorDatabase,
         id=user_id,
         role=existing_user["role"]
     )
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user=Depends(get_current_user)):
+    """
+    Returns hit/miss counters of the in-process authentication caches. Only accessible by admins.
+
+    Args:
+        current_user (UserInDB): The current authenticated admin.
+
+    Returns:
+        dict: Cache statistics for users and decoded tokens.
+    """
+    check_role(current_user, "admin")
+    return cache_stats()
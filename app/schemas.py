@@ -1,9 +1,15 @@
-from typing import Optional, Literal, List
+from typing import Optional, Literal, List, Dict, Generic, TypeVar, Union, Annotated
 from app.utils.Enums import ExerciseType, Difficulty
 from pydantic import BaseModel, EmailStr, Field
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, date
 
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
 
 class UserCreate(BaseModel):
     username: str
@@ -45,6 +51,25 @@ class ExerciseResponse(BaseModel):
     exerciseType: ExerciseType
     difficulty: Difficulty
 
+class ExerciseSearchResponse(BaseModel):
+    items: List[ExerciseResponse]
+    total: int
+    facets: Dict[str, Dict[str, int]]
+
+class ExerciseSuggestion(BaseModel):
+    id: str
+    name: str
+
+class MediaJobResponse(BaseModel):
+    id: str
+    exercise_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    attempts: int = 0
+    outputs: Optional[Dict[str, str]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 class ExerciseUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -57,6 +82,7 @@ class ExerciseUpdate(BaseModel):
 
 class ExercisePerformanceBase(BaseModel):
     exercise_id: str
+    hour: Optional[str] = Field(None, pattern=r"^\d{2}:\d{2}$")
     duration_min: Optional[int] = None
     numberOfSets: Optional[int] = None
     numberOfRepetitions: Optional[int] = None
@@ -68,13 +94,56 @@ class ExercisePerformanceBase(BaseModel):
 class ExercisePerformanceCreate(ExercisePerformanceBase):
     pass
 
+class ExerciseSummary(BaseModel):
+    id: str
+    name: str
+    exerciseType: ExerciseType
+    difficulty: Difficulty
+    thumbnail_url: Optional[str] = None
+
 class ExercisePerformanceResponse(ExercisePerformanceBase):
     id: str
+    exercise: Optional[ExerciseSummary] = None
+
+class ExercisePerformancePatch(BaseModel):
+    exercise_id: Optional[str] = None
+    hour: Optional[str] = Field(None, pattern=r"^\d{2}:\d{2}$")
+    duration_min: Optional[int] = None
+    numberOfSets: Optional[int] = None
+    numberOfRepetitions: Optional[int] = None
+    weight: Optional[float] = None
+    intervalBetween_days: Optional[int] = None
+    done: Optional[bool] = None
+    notes: Optional[str] = None
+
+class AddExerciseOperation(BaseModel):
+    op: Literal["add"]
+    exercise: ExercisePerformanceCreate
+
+class UpdateExerciseOperation(BaseModel):
+    op: Literal["update"]
+    id: str
+    changes: ExercisePerformancePatch
+
+class RemoveExerciseOperation(BaseModel):
+    op: Literal["remove"]
+    id: str
+
+class DoneExerciseOperation(BaseModel):
+    op: Literal["done"]
+    id: str
+    done: bool = True
+
+ExerciseOperation = Annotated[
+    Union[AddExerciseOperation, UpdateExerciseOperation, RemoveExerciseOperation, DoneExerciseOperation],
+    Field(discriminator="op"),
+]
 
 class CalendarBase(BaseModel):
     date: datetime
     steps: Optional[int] = None
     maxSteps: Optional[int] = None
+    hourlySteps: Optional[Dict[str, int]] = None
     exercises: Optional[List[ExercisePerformanceCreate]] = []
 
 class CalendarCreate(CalendarBase):
@@ -85,6 +154,8 @@ class CalendarResponse(CalendarBase):
     id: str
     user_id: str
     exercises: Optional[List[ExercisePerformanceResponse]] = []
+    version: int = 0
+    updated_at: Optional[datetime] = None
 
 class StepsBase(BaseModel):
     steps: Optional[int] = None
@@ -103,3 +174,64 @@ class StepsResponse(StepsBase):
 class StepsHistoryResponse(BaseModel):
     steps: Optional[int] = 0
     date: datetime
+
+class HourlyStepsSample(BaseModel):
+    hour: int = Field(..., ge=0, le=23)
+    steps: int
+
+class StepsBatchItem(BaseModel):
+    date: date
+    steps: Optional[int] = None
+    maxSteps: Optional[int] = None
+    hours: Optional[List[HourlyStepsSample]] = None
+
+class StepsBatchResult(BaseModel):
+    date: date
+    status: Literal["created", "updated", "error"]
+    error: Optional[str] = None
+
+class StepsSummaryResponse(BaseModel):
+    period: str
+    start: date
+    sum: int
+    avg: float
+    max: Optional[int] = None
+    days: int
+    goalHits: int
+
+class PlanHour(BaseModel):
+    hour: str = Field(..., pattern=r"^\d{2}:\d{2}$")
+    exercises: List[ExercisePerformanceCreate]
+
+class CalendarPlan(BaseModel):
+    startDate: date
+    stopDate: date
+    hours: List[PlanHour]
+
+class PlanHourDelete(BaseModel):
+    hour: str = Field(..., pattern=r"^\d{2}:\d{2}$")
+    exercise_ids: Optional[List[str]] = None
+
+class CalendarPlanDelete(BaseModel):
+    startDate: date
+    stopDate: date
+    hours: Optional[List[PlanHourDelete]] = None
+
+class SyncTombstone(BaseModel):
+    kind: Literal["calendar", "exercise"]
+    id: str
+    deleted_at: datetime
+
+class SyncResponse(BaseModel):
+    calendar: List[CalendarResponse]
+    exercises: List[ExerciseResponse]
+    deleted: List[SyncTombstone]
+    token: str
+    has_more: bool
+    full: bool
+
+class CalendarPlanResult(BaseModel):
+    matched: int
+    modified: int
+    upserted: int
+    failed: List[date] = []
@@ -0,0 +1,327 @@
+import io
+import os
+import re
+import time
+import asyncio
+from datetime import timedelta
+from abc import ABC, abstractmethod
+from fastapi import HTTPException
+from app.config import STORAGE_BACKEND, LOCAL_STORAGE_PATH, MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, \
+    MINIO_BUCKET, MINIO_REGION, UPLOAD_PART_SIZE, STREAM_CHUNK_SIZE, PRESIGNED_URL_EXPIRES, PRESIGNED_URL_REFRESH_MARGIN
+from app.utils.cache import TTLCache
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int):
+    """
+    Odczytuje pojedynczy zakres z nagłówka Range.
+
+    Args:
+        header (str): Wartość nagłówka Range (np. "bytes=0-1023", "bytes=1000-", "bytes=-500").
+        size (int): Rozmiar obiektu w bajtach.
+
+    Raises:
+        HTTPException: Jeśli zakres jest niespełnialny, zgłasza błąd 416 (Range Not Satisfiable).
+
+    Returns:
+        tuple: (start, end) włącznie lub None, gdy nagłówka brak albo ma nieobsługiwaną postać (wiele zakresów).
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def fixed_size_chunks(stream, chunk_size: int, max_size: int = None):
+    """
+    Dzieli strumień bajtów (np. `request.stream()`) na kawałki o stałym rozmiarze (ostatni może być krótszy).
+
+    W pamięci trzymany jest najwyżej jeden kawałek.
+
+    Args:
+        stream: Asynchroniczny iterator bajtów.
+        chunk_size (int): Rozmiar kawałka w bajtach.
+        max_size (int, optional): Maksymalny łączny rozmiar strumienia.
+
+    Raises:
+        HTTPException: Jeśli strumień przekracza `max_size`, zgłasza błąd 413 (Payload Too Large).
+
+    Yields:
+        bytes: Kolejne kawałki.
+    """
+    buffer = bytearray()
+    total = 0
+    async for data in stream:
+        total += len(data)
+        if max_size is not None and total > max_size:
+            raise HTTPException(status_code=413, detail="File too large")
+        buffer.extend(data)
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def file_chunks(path: str, chunk_size: int = None):
+    """
+    Czyta plik z dysku kawałkami w wątku roboczym (np. do wysłania go do magazynu przez `put_stream`).
+
+    Args:
+        path (str): Ścieżka pliku.
+        chunk_size (int, optional): Rozmiar kawałka; domyślnie UPLOAD_PART_SIZE.
+
+    Yields:
+        bytes: Kolejne kawałki pliku.
+    """
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as file:
+        while True:
+            chunk = await loop.run_in_executor(None, file.read, chunk_size or UPLOAD_PART_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+class StorageBackend(ABC):
+    """Interfejs magazynu plików (filmy i miniatury ćwiczeń)."""
+
+    @abstractmethod
+    async def put_stream(self, key: str, chunks, content_type: str) -> int:
+        """
+        Zapisuje obiekt z asynchronicznego strumienia kawałków, bez buforowania całości w pamięci.
+
+        Args:
+            key (str): Klucz (ścieżka) obiektu.
+            chunks: Asynchroniczny iterator kawałków bajtów.
+            content_type (str): Typ MIME obiektu.
+
+        Returns:
+            int: Rozmiar zapisanego obiektu w bajtach.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Usuwa obiekt (brak obiektu nie jest błędem)."""
+
+    @abstractmethod
+    async def size(self, key: str) -> int:
+        """Zwraca rozmiar obiektu w bajtach."""
+
+    @abstractmethod
+    def get_range(self, key: str, start: int, end: int):
+        """
+        Strumieniuje fragment obiektu.
+
+        Args:
+            key (str): Klucz obiektu.
+            start (int): Pierwszy bajt.
+            end (int): Ostatni bajt (włącznie).
+
+        Returns:
+            Asynchroniczny iterator kawałków bajtów.
+        """
+
+    def local_path(self, key: str):
+        """Ścieżka pliku na dysku, jeśli magazyn jest lokalny (pozwala wysłać plik przez sendfile), inaczej None."""
+        return None
+
+    async def presigned_url(self, key: str):
+        """Krótkotrwały podpisany URL do pobrania obiektu z pominięciem API: (url, czas wygaśnięcia) lub None, jeśli magazyn go nie wspiera."""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Magazyn na lokalnym dysku - do pracy offline i testów."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        """Zwraca ścieżkę pliku dla klucza, nie pozwalając wyjść poza katalog magazynu."""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    async def put_stream(self, key: str, chunks, content_type: str) -> int:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        loop = asyncio.get_running_loop()
+        size = 0
+        # Zapis do pliku tymczasowego i atomowa podmiana po zakończeniu
+        tmp_path = f"{path}.part"
+        try:
+            with open(tmp_path, "wb") as file:
+                async for chunk in chunks:
+                    await loop.run_in_executor(None, file.write, chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return size
+
+    async def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    async def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    async def get_range(self, key: str, start: int, end: int):
+        loop = asyncio.get_running_loop()
+        with open(self.path(key), "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, file.read, min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def local_path(self, key: str):
+        return self.path(key)
+
+
+class _AsyncChunksReader(io.RawIOBase):
+    """
+    Plikopodobny adapter na asynchroniczny strumień kawałków, czytany z wątku roboczego.
+
+    Klient MinIO jest synchroniczny, więc `put_object` działa w wątku i pobiera kolejne
+    kawałki z pętli zdarzeń przez `run_coroutine_threadsafe`.
+    """
+
+    def __init__(self, chunks, loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks.__aiter__()
+        self._loop = loop
+        self._buffer = bytearray()
+        self._finished = False
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_chunk(self) -> bytes:
+        future = asyncio.run_coroutine_threadsafe(self._chunks.__anext__(), self._loop)
+        try:
+            return future.result()
+        except StopAsyncIteration:
+            return b""
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._finished and (size < 0 or len(self._buffer) < size):
+            chunk = self._next_chunk()
+            if not chunk:
+                self._finished = True
+                break
+            self._buffer.extend(chunk)
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.size += len(data)
+        return data
+
+
+class MinioStorage(StorageBackend):
+    """Magazyn w MinIO/S3 - obiekty wysyłane jako multipart upload w kawałkach `part_size`."""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket: str, part_size: int,
+                 region: str = None):
+        from minio import Minio
+        from urllib.parse import urlparse
+
+        parsed = urlparse(endpoint if "://" in endpoint else f"http://{endpoint}")
+        self.client = Minio(parsed.netloc, access_key=access_key, secret_key=secret_key,
+                            secure=parsed.scheme == "https", region=region)
+        self.bucket = bucket
+        self.part_size = part_size
+        self._bucket_ready = False
+        # Podpisane URL-e wydajemy ponownie do chwili tuż przed ich wygaśnięciem
+        self._presigned = TTLCache(maxsize=10000, ttl=PRESIGNED_URL_EXPIRES - PRESIGNED_URL_REFRESH_MARGIN)
+
+    async def _ensure_bucket(self):
+        if self._bucket_ready:
+            return
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self.client.bucket_exists, self.bucket):
+            await loop.run_in_executor(None, self.client.make_bucket, self.bucket)
+        self._bucket_ready = True
+
+    async def put_stream(self, key: str, chunks, content_type: str) -> int:
+        await self._ensure_bucket()
+        loop = asyncio.get_running_loop()
+        reader = _AsyncChunksReader(chunks, loop)
+        # length=-1: nieznany rozmiar, klient wysyła multipart po `part_size` bajtów
+        await loop.run_in_executor(None, lambda: self.client.put_object(
+            self.bucket, key, reader, length=-1, part_size=self.part_size, content_type=content_type,
+        ))
+        return reader.size
+
+    async def delete(self, key: str):
+        await self._ensure_bucket()
+        await asyncio.get_running_loop().run_in_executor(None, self.client.remove_object, self.bucket, key)
+        self._presigned.invalidate(key)
+
+    async def size(self, key: str) -> int:
+        stat = await asyncio.get_running_loop().run_in_executor(None, self.client.stat_object, self.bucket, key)
+        return stat.size
+
+    async def get_range(self, key: str, start: int, end: int):
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(None, lambda: self.client.get_object(
+            self.bucket, key, offset=start, length=end - start + 1,
+        ))
+        try:
+            chunks = response.stream(STREAM_CHUNK_SIZE)
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def presigned_url(self, key: str):
+        cached = self._presigned.get(key)
+        if cached is not None:
+            return cached
+        url = await asyncio.get_running_loop().run_in_executor(None, lambda: self.client.presigned_get_object(
+            self.bucket, key, expires=timedelta(seconds=PRESIGNED_URL_EXPIRES),
+        ))
+        expires_at = time.time() + PRESIGNED_URL_EXPIRES
+        self._presigned.set(key, (url, expires_at))
+        return url, expires_at
+
+
+storage = None
+
+
+def get_storage() -> StorageBackend:
+    """Zwraca skonfigurowany magazyn plików (tworzony przy pierwszym użyciu)."""
+    global storage
+    if storage is None:
+        if STORAGE_BACKEND == "local":
+            storage = LocalStorage(LOCAL_STORAGE_PATH)
+        else:
+            storage = MinioStorage(MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET, UPLOAD_PART_SIZE,
+                                   MINIO_REGION)
+    return storage
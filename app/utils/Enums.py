@@ -0,0 +1 @@
+enums.py
\ No newline at end of file
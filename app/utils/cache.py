@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Prosty cache w pamięci procesu: wpisy wygasają po czasie (TTL),
+    a po przekroczeniu rozmiaru usuwany jest najdawniej używany (LRU).
+
+    Cache jest lokalny dla procesu - każdy worker ma własną kopię.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """
+        Zwraca wartość z cache albo `default`, jeśli jej brak lub wygasła.
+
+        Args:
+            key: Klucz wpisu.
+            default: Wartość zwracana przy braku wpisu.
+
+        Returns:
+            Zapisana wartość lub `default`.
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Zapisuje wartość w cache.
+
+        Args:
+            key: Klucz wpisu.
+            value: Wartość do zapisania.
+            ttl (float, optional): Czas życia wpisu w sekundach; domyślnie `self.ttl`.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Usuwa wpis z cache (jeśli istnieje)."""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Czyści cały cache."""
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Zwraca liczniki trafień i chybień oraz aktualny rozmiar cache."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,272 @@
+import asyncio
+import argparse
+from datetime import datetime, date
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.config import CALENDAR_ID_MODE
+from app.utils.sync import record_tombstone
+
+
+def day_key(day: date) -> int:
+    """Zwarty klucz dnia w postaci liczby YYYYMMDD."""
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def day_id(user_id: str, day: date) -> str:
+    """
+    Deterministyczne `_id` dnia kalendarza: "<user_id>:<YYYYMMDD>".
+
+    Args:
+        user_id (str): ID użytkownika.
+        day (date): Dzień (także datetime - liczy się tylko data).
+
+    Returns:
+        str: Identyfikator dokumentu dnia.
+    """
+    return f"{user_id}:{day_key(day)}"
+
+
+def parse_day_id(calendar_id: str):
+    """
+    Odczytuje ID użytkownika i dzień z deterministycznego `_id`.
+
+    Returns:
+        tuple: (user_id, date) lub None, jeśli `calendar_id` nie ma tej postaci.
+    """
+    user_id, _, key = calendar_id.rpartition(":")
+    if not user_id or len(key) != 8 or not key.isdigit():
+        return None
+    try:
+        return user_id, date(int(key[:4]), int(key[4:6]), int(key[6:]))
+    except ValueError:
+        return None
+
+
+# Znacznik zakończonej migracji w kolekcji `schema_migrations` - zapisuje go migracja uruchomiona
+# w trybie `day`, gdy nie zostało już żadne `_id` typu ObjectId
+MIGRATED_MARKER = "calendar_ids"
+
+_migrated = False
+
+
+async def load_migration_state(db: AsyncIOMotorDatabase):
+    """Odczytuje znacznik zakończonej migracji `_id` (wywoływane w lifespan workera)."""
+    global _migrated
+    _migrated = await db.schema_migrations.find_one({"_id": MIGRATED_MARKER}) is not None
+
+
+def point_lookups() -> bool:
+    """Czy dzień można adresować po deterministycznym `_id` - tryb `day` i wszystkie dni przepisane."""
+    return CALENDAR_ID_MODE == "day" and _migrated
+
+
+def day_filter(user_id: str, day: datetime) -> dict:
+    """
+    Filtr jednego dnia użytkownika.
+
+    Po zakończonej migracji (`point_lookups`) to zapytanie punktowe po `_id`. Wcześniej - po parze
+    (user_id, date): unikalny indeks wskazuje jeden dokument niezależnie od postaci jego `_id`, więc
+    upsert nie koliduje z dniami, których migracja jeszcze nie przepisała.
+    """
+    if point_lookups():
+        return {"_id": day_id(user_id, day)}
+    return {"user_id": user_id, "date": day}
+
+
+def day_insert_fields(user_id: str, day: datetime) -> dict:
+    """
+    Pola, które upsert musi ustawić przy tworzeniu dnia (`$setOnInsert`) - uzupełnienie `day_filter`.
+
+    Przy filtrze po `_id` ustawiamy (user_id, date); przy filtrze po (user_id, date) MongoDB kopiuje
+    je z filtra, a `_id` nadajemy sami (zależnie od trybu), żeby znać je bez ponownego odczytu.
+    """
+    if point_lookups():
+        return {"user_id": user_id, "date": day}
+    return {"_id": new_day_id(user_id, day)}
+
+
+def new_day_id(user_id: str, day: datetime):
+    """`_id` nowo wstawianego dnia: deterministyczne w trybie `day`, ObjectId w trybie `objectid`."""
+    if CALENDAR_ID_MODE == "day":
+        return day_id(user_id, day)
+    return ObjectId()
+
+
+def calendar_id_filter(calendar_id: str, user_id: str) -> dict:
+    """
+    Tłumaczy publiczne `calendar_id` na filtr dokumentu, niezależnie od trybu przechowywania.
+
+    Obsługiwane są oba rodzaje identyfikatorów: ObjectId (w trybie `day` szukane po `_id` lub `legacy_id`,
+    bo dzień mógł już zostać przepisany) oraz "<user_id>:<YYYYMMDD>" (szukane po dacie - trafia także
+    w dni, które nie zostały jeszcze przepisane). Po zakończonej migracji oba są wyszukiwane punktowo:
+    po `_id` albo po `legacy_id`.
+
+    Args:
+        calendar_id (str): ID z adresu żądania.
+        user_id (str): ID zalogowanego użytkownika.
+
+    Raises:
+        HTTPException: Jeśli ID jest nieprawidłowe lub należy do innego użytkownika, zgłasza błąd 404 (Not Found).
+
+    Returns:
+        dict: Filtr dla kolekcji `calendar`.
+    """
+    parsed = parse_day_id(calendar_id)
+    if parsed is not None:
+        owner, day = parsed
+        if owner != user_id:
+            raise HTTPException(status_code=404, detail="Calendar entry not found")
+        if point_lookups():
+            return {"_id": calendar_id}
+        return {"user_id": user_id, "date": datetime(day.year, day.month, day.day)}
+
+    if ObjectId.is_valid(calendar_id):
+        if point_lookups():
+            return {"legacy_id": ObjectId(calendar_id), "user_id": user_id}
+        if CALENDAR_ID_MODE == "day":
+            return {"$or": [{"_id": ObjectId(calendar_id)}, {"legacy_id": ObjectId(calendar_id)}], "user_id": user_id}
+        return {"_id": ObjectId(calendar_id), "user_id": user_id}
+    raise HTTPException(status_code=404, detail="Calendar entry not found")
+
+
+async def _supports_transactions(db: AsyncIOMotorDatabase) -> bool:
+    hello = await db.command("hello")
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+
+async def _restore(db: AsyncIOMotorDatabase, doc: dict):
+    """Przywraca oryginał dnia po nieudanym przepisaniu bez transakcji i usuwa jego kopię zapasową."""
+    try:
+        await db.calendar.insert_one(doc)
+    except DuplicateKeyError:
+        return  # dzień ma już nowy dokument - oryginał trafi do calendar_id_conflicts albo zostanie w kopii
+    await db.calendar_id_backup.delete_one({"_id": doc["_id"]})
+
+
+async def _rewrite(db: AsyncIOMotorDatabase, doc: dict, session=None):
+    # Nowe updated_at i ślad usunięcia starego _id - klienci synchronizujący przyrostowo podmienią ID dnia
+    new_doc = {**doc, "_id": day_id(doc["user_id"], doc["date"]), "legacy_id": doc["_id"],
+               "updated_at": datetime.utcnow()}
+    if session is None:
+        # Bez transakcji oryginał trafia najpierw do kopii zapasowej - przetrwa błąd między usunięciem a wstawieniem
+        await db.calendar_id_backup.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    # Najpierw usuwamy stary dokument - unikalny indeks (user_id, date) nie pozwala na oba naraz
+    await db.calendar.delete_one({"_id": doc["_id"]}, session=session)
+    try:
+        await db.calendar.insert_one(new_doc, session=session)
+    except PyMongoError:
+        if session is None:
+            await _restore(db, doc)
+        raise
+    await record_tombstone(db, "calendar", doc["_id"], doc["user_id"], session=session)
+    if session is None:
+        await db.calendar_id_backup.delete_one({"_id": doc["_id"]})
+
+
+async def _restore_backups(db: AsyncIOMotorDatabase) -> int:
+    """
+    Przywraca dni z kopii zapasowych, które zostały po przerwanym przepisywaniu (np. utracie połączenia).
+
+    Returns:
+        int: Liczba przywróconych dni.
+    """
+    restored = 0
+    async for doc in db.calendar_id_backup.find({}):
+        exists = await db.calendar.find_one({"$or": [{"_id": doc["_id"]}, {"legacy_id": doc["_id"]}]}, {"_id": 1})
+        conflict = await db.calendar_id_conflicts.find_one({"_id": doc["_id"]}, {"_id": 1})
+        if exists is None and conflict is None:
+            try:
+                await db.calendar.insert_one(doc)
+                restored += 1
+            except DuplicateKeyError:
+                await db.calendar_id_conflicts.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+        await db.calendar_id_backup.delete_one({"_id": doc["_id"]})
+    return restored
+
+
+async def migrate_calendar_ids(db: AsyncIOMotorDatabase, batch_size: int = 500, pause: float = 0.0) -> dict:
+    """
+    Przepisuje dni kalendarza z losowym ObjectId na deterministyczne `_id` (online, partiami).
+
+    Stare `_id` zostaje w polu `legacy_id`, więc dotychczasowe `calendar_id` klientów dalej działają.
+    Na replica secie każdy dokument jest przepisywany w transakcji. Bez transakcji między usunięciem
+    a wstawieniem jest krótka przerwa - jeśli w tym czasie aplikacja utworzy ten sam dzień, oryginał
+    trafia do kolekcji `calendar_id_conflicts` do ręcznego scalenia, a na czas przepisywania leży też
+    w `calendar_id_backup` - po błędzie wstawienia jest przywracany, a kopie po przerwanym uruchomieniu
+    przywraca kolejne uruchomienie. Dni utworzone w trakcie migracji
+    (tryb `objectid`) są przepisywane w kolejnych partiach - po przełączeniu CALENDAR_ID_MODE=day
+    warto uruchomić migrację jeszcze raz. Uruchomienie w trybie `day`, po którym nie zostało żadne
+    `_id` typu ObjectId, zapisuje MIGRATED_MARKER - workery startujące później adresują dni po `_id`.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        batch_size (int): Liczba dokumentów w partii.
+        pause (float): Przerwa między partiami w sekundach (ogranicza obciążenie bazy).
+
+    Returns:
+        dict: Liczniki {"migrated", "conflicts", "failed"} i "complete" (czy zapisano znacznik).
+    """
+    transactions = await _supports_transactions(db)
+    stats = {"migrated": 0, "conflicts": 0, "failed": 0, "complete": False}
+    restored = await _restore_backups(db)
+    if restored:
+        print(f"🛠️ Przywrócono {restored} dni z kopii zapasowej poprzedniego uruchomienia")
+    failed = []
+    while True:
+        query = {"_id": {"$type": "objectId", "$nin": failed}}
+        batch = await db.calendar.find(query).limit(batch_size).to_list(length=None)
+        if not batch:
+            remaining = await db.calendar.count_documents({"_id": {"$type": "objectId"}}, limit=1)
+            if CALENDAR_ID_MODE == "day" and not remaining:
+                await db.schema_migrations.update_one(
+                    {"_id": MIGRATED_MARKER}, {"$set": {"completed_at": datetime.utcnow()}}, upsert=True,
+                )
+                stats["complete"] = True
+            return stats
+        for doc in batch:
+            try:
+                if transactions:
+                    async with await db.client.start_session() as session:
+                        await session.with_transaction(lambda s, doc=doc: _rewrite(db, doc, s))
+                else:
+                    await _rewrite(db, doc)
+                stats["migrated"] += 1
+            except DuplicateKeyError:
+                # Dzień o nowym _id już istnieje - oryginał odkładamy do ręcznego scalenia
+                await db.calendar_id_conflicts.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+                await db.calendar.delete_one({"_id": doc["_id"]})
+                await record_tombstone(db, "calendar", doc["_id"], doc["user_id"])
+                await db.calendar_id_backup.delete_one({"_id": doc["_id"]})
+                stats["conflicts"] += 1
+            except PyMongoError as e:
+                # Także błędy połączenia (AutoReconnect) - oryginał przywrócony lub w kopii, migracja idzie dalej
+                print(f"⚠️ Nie przepisano dnia {doc['_id']}: {e}")
+                failed.append(doc["_id"])
+                stats["failed"] += 1
+        print(f"🛠️ Przepisano {stats['migrated']} dni (konflikty: {stats['conflicts']}, błędy: {stats['failed']})")
+        if pause:
+            await asyncio.sleep(pause)
+
+
+async def _main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.config import MONGO_URL
+
+    parser = argparse.ArgumentParser(description="Migracja _id dni kalendarza na postać <user_id>:<YYYYMMDD>")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.0, help="Przerwa między partiami (s)")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    try:
+        started = datetime.utcnow()
+        stats = await migrate_calendar_ids(client["fitness_app"], args.batch_size, args.pause)
+        print(f"✅ Migracja zakończona w {datetime.utcnow() - started}: {stats}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,159 @@
+import re
+import json
+import asyncio
+import bisect
+import hashlib
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.schemas import ExerciseResponse
+
+
+class PrefixIndex:
+    """
+    Indeks prefiksowy nazw ćwiczeń do podpowiedzi (typeahead) - posortowana lista kluczy i wyszukiwanie binarne.
+
+    Indeksowana jest cała nazwa oraz każde jej słowo, więc "up" znajdzie też "Push-up".
+    """
+
+    def __init__(self, items: list):
+        entries = set()
+        for item in items:
+            name = item["name"].lower()
+            entries.add((name, item["id"]))
+            for word in re.findall(r"\w+", name):
+                entries.add((word, item["id"]))
+        self._entries = sorted(entries)
+        self._keys = [key for key, _ in self._entries]
+        self._names = {item["id"]: item["name"] for item in items}
+
+    def search(self, prefix: str, limit: int = 10) -> list:
+        """
+        Zwraca ćwiczenia, których nazwa lub słowo w nazwie zaczyna się od `prefix`.
+
+        Args:
+            prefix (str): Wpisany przez użytkownika początek nazwy.
+            limit (int): Maksymalna liczba podpowiedzi.
+
+        Returns:
+            list: Lista słowników {"id", "name"} bez powtórzeń.
+        """
+        prefix = prefix.lower()
+        results, seen = [], set()
+        for position in range(bisect.bisect_left(self._keys, prefix), len(self._keys)):
+            key, exercise_id = self._entries[position]
+            if not key.startswith(prefix) or len(results) >= limit:
+                break
+            if exercise_id not in seen:
+                seen.add(exercise_id)
+                results.append({"id": exercise_id, "name": self._names[exercise_id]})
+        return results
+
+
+class CatalogSnapshot:
+    """Niezmienny obraz katalogu ćwiczeń: gotowe bajty JSON, ETag, słownik ćwiczeń po ID i indeks prefiksowy."""
+
+    def __init__(self, version: int, items: list):
+        self.version = version
+        self.items = items
+        self.by_id = {item["id"]: item for item in items}
+        self.body = json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.prefix_index = PrefixIndex(items)
+
+
+class ExerciseCatalog:
+    """
+    Cache całego katalogu ćwiczeń w pamięci procesu.
+
+    Obraz jest budowany przy pierwszym odczycie i unieważniany po każdej zmianie
+    kolekcji `exercises`. Równoległe odczyty przy pustym cache czekają na jedną przebudowę.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._snapshot: CatalogSnapshot = None
+        self._building = None  # (wersja, zadanie przebudowy)
+
+    def invalidate(self):
+        """Unieważnia obraz katalogu - wywoływane po dodaniu, zmianie lub usunięciu ćwiczenia."""
+        self.version += 1
+        self._snapshot = None
+
+    def peek(self) -> CatalogSnapshot:
+        """Zwraca aktualny obraz katalogu, jeśli jest już zbudowany - bez odpytywania bazy."""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        return None
+
+    async def get(self, db: AsyncIOMotorDatabase) -> CatalogSnapshot:
+        """
+        Zwraca aktualny obraz katalogu, budując go w razie potrzeby.
+
+        Args:
+            db (AsyncIOMotorDatabase): Obiekt bazy danych.
+
+        Returns:
+            CatalogSnapshot: Obraz katalogu.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        if self._building is not None and self._building[0] == self.version:
+            return await asyncio.shield(self._building[1])
+
+        building = (self.version, asyncio.ensure_future(self._build(db, self.version)))
+        self._building = building
+        try:
+            return await asyncio.shield(building[1])
+        finally:
+            if self._building is building and building[1].done():
+                self._building = None
+
+    async def _build(self, db: AsyncIOMotorDatabase, version: int) -> CatalogSnapshot:
+        exercises = await db.exercises.find().sort("_id", 1).to_list(length=None)
+        items = [
+            ExerciseResponse(id=str(ex["_id"]), **{k: ex.get(k) for k in ExerciseResponse.model_fields.keys() if k != "id"})
+            .model_dump(mode="json")
+            for ex in exercises
+        ]
+        snapshot = CatalogSnapshot(version, items)
+        # Jeśli w trakcie budowy katalog się zmienił, nie zapisujemy nieaktualnego obrazu
+        if version == self.version:
+            self._snapshot = snapshot
+        return snapshot
+
+
+exercise_catalog = ExerciseCatalog()
+
+
+SUMMARY_FIELDS = ("name", "exerciseType", "difficulty", "thumbnail_url")
+
+
+async def load_exercise_summaries(db: AsyncIOMotorDatabase, exercise_ids) -> dict:
+    """
+    Rozwiązuje wiele ID ćwiczeń naraz (w stylu DataLoadera).
+
+    Najpierw korzysta z obrazu katalogu w pamięci, a brakujące ID pobiera jednym zapytaniem `$in`.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        exercise_ids: ID ćwiczeń (powtórzenia są pomijane).
+
+    Returns:
+        dict: Słownik ID -> {"id", "name", "exerciseType", "difficulty", "thumbnail_url"}.
+    """
+    snapshot = exercise_catalog.peek()
+    summaries, missing = {}, []
+    for exercise_id in set(exercise_ids):
+        if snapshot is not None and exercise_id in snapshot.by_id:
+            item = snapshot.by_id[exercise_id]
+            summaries[exercise_id] = {"id": exercise_id, **{k: item.get(k) for k in SUMMARY_FIELDS}}
+        elif ObjectId.is_valid(exercise_id):
+            missing.append(ObjectId(exercise_id))
+
+    if missing:
+        projection = {field: 1 for field in SUMMARY_FIELDS}
+        async for ex in db.exercises.find({"_id": {"$in": missing}}, projection):
+            summaries[str(ex["_id"])] = {"id": str(ex["_id"]), **{k: ex.get(k) for k in SUMMARY_FIELDS}}
+    return summaries
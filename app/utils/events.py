@@ -0,0 +1,140 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.config import EVENTS_BACKEND, EVENTS_BUFFER_SIZE, WEB_CONCURRENCY
+from app.utils.serialization import calendar_item
+
+# Zdarzenie wysyłane zamiast zgubionych przy przepełnieniu bufora - klient dociąga zmiany przez GET /sync
+RESYNC_EVENT = {"type": "changed"}
+
+
+def day_event(doc: dict) -> dict:
+    """Zdarzenie z pełnym stanem dnia (jak w GET /calendar/{id})."""
+    return {"type": "day", "day": calendar_item(doc)}
+
+
+def changed_event(calendar_id=None, version: int = None) -> dict:
+    """
+    Zdarzenie "coś się zmieniło" - gdy pełny stan dnia nie jest pod ręką (zapisy hurtowe, zmiany ćwiczeń).
+
+    Klient pobiera wtedy dzień po ID (z If-None-Match) albo wywołuje GET /sync.
+    """
+    event = {"type": "changed"}
+    if calendar_id is not None:
+        event.update(id=str(calendar_id), version=version)
+    return event
+
+
+def deleted_event(calendar_id) -> dict:
+    """Zdarzenie usunięcia dnia."""
+    return {"type": "deleted", "id": str(calendar_id)}
+
+
+class Subscription:
+    """
+    Ograniczony bufor zdarzeń jednego połączenia.
+
+    Wolny odbiorca nie zatrzymuje publikującego ani nie zajmuje coraz więcej pamięci: po
+    przepełnieniu bufora zaległe zdarzenia są porzucane i zastępowane jednym RESYNC_EVENT.
+    """
+
+    def __init__(self, user_id: str, size: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=size)
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class EventHub:
+    """
+    Rozsyłanie zmian kalendarza do połączeń SSE użytkownika w obrębie procesu.
+
+    W trybie `local` zdarzenia publikują ścieżki zapisu w app/routes/calendar.py - widzą je tylko
+    połączenia obsługiwane przez ten sam worker. W trybie `change_stream` ścieżki zapisu nie publikują,
+    a każdy worker czyta change stream kolekcji `calendar` i `tombstones` (wymaga replica setu),
+    więc zdarzenie dociera do wszystkich workerów niezależnie od tego, który obsłużył zapis.
+    """
+
+    def __init__(self, backend: str, buffer_size: int):
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self._subscriptions = {}
+        self._task: asyncio.Task = None
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, self.buffer_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def _dispatch(self, user_id: str, event: dict):
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.push(event)
+
+    def publish(self, user_id: str, event: dict):
+        """
+        Publikuje zdarzenie ze ścieżki zapisu (bez I/O - nie spowalnia żądania).
+
+        Args:
+            user_id (str): Właściciel zmienionego dnia.
+            event (dict): Zdarzenie (day_event, changed_event, deleted_event).
+        """
+        if self.backend == "local":
+            self._dispatch(user_id, event)
+
+    async def _watch(self, db: AsyncIOMotorDatabase):
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": "calendar", "operationType": {"$in": ["insert", "update", "replace"]}},
+            {"ns.coll": "tombstones", "operationType": "insert", "fullDocument.kind": "calendar"},
+        ]}}]
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup") as stream:
+                    async for change in stream:
+                        doc = change.get("fullDocument")
+                        if doc is None:
+                            continue  # dzień usunięty zanim odczytano jego stan - przyjdzie ślad usunięcia
+                        if change["ns"]["coll"] == "tombstones":
+                            self._dispatch(doc["user_id"], deleted_event(doc["doc_id"]))
+                        else:
+                            self._dispatch(doc["user_id"], day_event(doc))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Błędy przejściowe Motor wznawia sam; tu trafiają tylko nieodwracalne - zdarzenia
+                # z przerwy są stracone, więc wszyscy odbiorcy dociągają zmiany przez GET /sync
+                print(f"⚠️ Change stream zdarzeń przerwany: {e}")
+                for subscriptions in list(self._subscriptions.values()):
+                    for subscription in subscriptions:
+                        subscription.push(RESYNC_EVENT)
+                await asyncio.sleep(1)
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Uruchamia czytanie change streamu (tylko w trybie `change_stream`; wywoływane w lifespan workera)."""
+        if self.backend == "local" and WEB_CONCURRENCY > 1:
+            print(f"⚠️ EVENTS_BACKEND=local przy {WEB_CONCURRENCY} workerach - zdarzenia dotrą tylko do połączeń "
+                  f"workera, który wykonał zapis; ustaw EVENTS_BACKEND=change_stream")
+        if self.backend == "change_stream" and db is not None:
+            self._task = asyncio.create_task(self._watch(db))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+event_hub = EventHub(EVENTS_BACKEND, EVENTS_BUFFER_SIZE)
@@ -0,0 +1,84 @@
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from app.config import EXERCISE_PATCH_MAX_OPERATIONS
+
+
+def _merge_operations(operations: list) -> tuple:
+    """
+    Grupuje operacje na ćwiczeniach dnia: nowe pozycje, zmiany pól po ID pozycji i ID do usunięcia.
+
+    Kolejne zmiany tej samej pozycji są składane w jedną (późniejsza wygrywa), a usunięcie
+    pozycji ma pierwszeństwo przed jej zmianami.
+    """
+    added, changes, removed = [], {}, set()
+    for operation in operations:
+        if operation.op == "add":
+            added.append({**operation.exercise.model_dump(), "id": str(ObjectId())})
+        elif operation.op == "remove":
+            removed.add(operation.id)
+        elif operation.op == "done":
+            changes.setdefault(operation.id, {})["done"] = operation.done
+        else:
+            changes.setdefault(operation.id, {}).update(operation.changes.model_dump(exclude_unset=True))
+    changes = {entry_id: fields for entry_id, fields in changes.items() if entry_id not in removed and fields}
+    return added, changes, removed
+
+
+def exercise_patch(operations: list, now: datetime = None) -> tuple:
+    """
+    Buduje jedną aktualizację dnia (pipeline) wykonującą wszystkie operacje na ćwiczeniach naraz.
+
+    MongoDB nie pozwala połączyć w jednej aktualizacji `$push`, `$pull` i `$set` z `arrayFilters`
+    na tej samej tablicy (konflikt ścieżek `exercises`), więc nowa tablica jest liczona w pipeline:
+    `$filter` usuwa pozycje, `$map` + `$mergeObjects` nakłada zmiany, `$concatArrays` dopisuje nowe.
+    Wartości od klienta trafiają do pipeline przez `$literal` (tekst zaczynający się od "$" nie jest ścieżką).
+
+    Args:
+        operations (list): Operacje add/update/remove/done z żądania.
+        now (datetime): Czas zmiany (domyślnie teraz, UTC).
+
+    Raises:
+        HTTPException: Jeśli lista operacji jest pusta, zgłasza błąd 400 (Bad Request), a jeśli
+            operacji jest więcej niż EXERCISE_PATCH_MAX_OPERATIONS - błąd 413.
+
+    Returns:
+        tuple: (pipeline, ID pozycji, które muszą istnieć w dniu).
+    """
+    if not operations:
+        raise HTTPException(status_code=400, detail="No operations")
+    if len(operations) > EXERCISE_PATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"Too many operations (max {EXERCISE_PATCH_MAX_OPERATIONS})")
+    added, changes, removed = _merge_operations(operations)
+
+    exercises = {"$ifNull": ["$exercises", []]}
+    if removed:
+        exercises = {"$filter": {
+            "input": exercises,
+            "as": "entry",
+            "cond": {"$not": {"$in": ["$$entry.id", {"$literal": sorted(removed)}]}},
+        }}
+    if changes:
+        exercises = {"$map": {
+            "input": exercises,
+            "as": "entry",
+            "in": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": ["$$entry.id", {"$literal": entry_id}]},
+                     "then": {"$mergeObjects": ["$$entry", {"$literal": fields}]}}
+                    for entry_id, fields in changes.items()
+                ],
+                "default": "$$entry",
+            }},
+        }}
+    if added:
+        exercises = {"$concatArrays": [exercises, {"$literal": added}]}
+
+    pipeline = [{"$set": {
+        "exercises": exercises,
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+        "updated_at": {"$literal": now or datetime.utcnow()},
+    }}]
+    targets = sorted({operation.id for operation in operations if operation.op != "add"})
+    return pipeline, targets
@@ -0,0 +1,67 @@
+import io
+import csv
+import json
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+EXERCISE_COLUMNS = [
+    "exercise_id", "hour", "duration_min", "numberOfSets", "numberOfRepetitions",
+    "weight", "intervalBetween_days", "done", "notes",
+]
+CSV_COLUMNS = ["id", "date", "steps", "maxSteps", "entry_id"] + EXERCISE_COLUMNS
+
+
+def _day_dict(doc: dict) -> dict:
+    """Zamienia dokument dnia na słownik gotowy do zapisu w JSON."""
+    return {
+        "id": str(doc["_id"]),
+        "date": doc["date"].date().isoformat(),
+        "steps": doc.get("steps"),
+        "maxSteps": doc.get("maxSteps"),
+        "hourlySteps": doc.get("hourlySteps"),
+        "exercises": doc.get("exercises") or [],
+    }
+
+
+async def ndjson_rows(cursor: AsyncIOMotorCursor):
+    """
+    Generuje kolejne linie NDJSON (jeden dzień na linię) w miarę pobierania dokumentów z kursora.
+
+    Args:
+        cursor (AsyncIOMotorCursor): Kursor po dokumentach kalendarza.
+
+    Yields:
+        bytes: Linia NDJSON zakończona znakiem nowej linii.
+    """
+    async for doc in cursor:
+        yield (json.dumps(_day_dict(doc), ensure_ascii=False) + "\n").encode()
+
+
+async def csv_rows(cursor: AsyncIOMotorCursor):
+    """
+    Generuje wiersze CSV w miarę pobierania dokumentów z kursora.
+
+    Ćwiczenia są spłaszczone - jeden wiersz na ćwiczenie, a dzień bez ćwiczeń daje jeden wiersz
+    z pustymi kolumnami ćwiczenia.
+
+    Args:
+        cursor (AsyncIOMotorCursor): Kursor po dokumentach kalendarza.
+
+    Yields:
+        bytes: Nagłówek, a potem wiersze CSV kolejnych dni.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode()
+
+    async for doc in cursor:
+        buffer.seek(0)
+        buffer.truncate()
+        day = _day_dict(doc)
+        base = {"id": day["id"], "date": day["date"], "steps": day["steps"], "maxSteps": day["maxSteps"]}
+        if not day["exercises"]:
+            writer.writerow(base)
+        for exercise in day["exercises"]:
+            writer.writerow({**base, "entry_id": exercise.get("id"),
+                             **{column: exercise.get(column) for column in EXERCISE_COLUMNS}})
+        yield buffer.getvalue().encode()
@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+
+
+class PasswordHasher:
+    """
+    Wykonuje kosztowne operacje (bcrypt) poza pętlą zdarzeń, w dedykowanej puli wątków lub procesów.
+
+    Liczba oczekujących zadań jest ograniczona - po zapełnieniu kolejki kolejne
+    wywołania od razu kończą się błędem 503 zamiast blokować serwer.
+    """
+
+    def __init__(self, workers: int, queue_size: int, mode: str = "thread", retry_after: int = 1):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.mode = mode
+        self.retry_after = retry_after
+        self._executor: Executor = None
+        self._pending = 0
+
+    @property
+    def capacity(self) -> int:
+        """Maksymalna liczba zadań (wykonywanych i oczekujących) jednocześnie."""
+        return self.workers + self.queue_size
+
+    def start(self, initializer=None, initargs=()):
+        """
+        Tworzy pulę wykonawczą.
+
+        Args:
+            initializer (callable, optional): Funkcja wywoływana w każdym workerze przy starcie.
+            initargs (tuple): Argumenty dla `initializer`.
+        """
+        if self._executor is not None:
+            return
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializer, initargs=initargs)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hasher",
+                                                initializer=initializer, initargs=initargs)
+
+    def shutdown(self):
+        """Zamyka pulę, czekając na zakończenie rozpoczętych zadań."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def run(self, func, *args):
+        """
+        Uruchamia funkcję w puli i czeka na wynik.
+
+        Args:
+            func (callable): Funkcja do wykonania (w trybie `process` musi dać się zserializować).
+            *args: Argumenty funkcji.
+
+        Raises:
+            HTTPException: Jeśli kolejka jest pełna, zgłasza błąd 503 (Service Unavailable) z nagłówkiem Retry-After.
+
+        Returns:
+            Wynik funkcji.
+        """
+        if self._pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        if self._executor is None:
+            self.start()
+
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
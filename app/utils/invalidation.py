@@ -0,0 +1,84 @@
+import asyncio
+from pymongo import ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.config import CACHE_SYNC_INTERVAL
+
+
+class CacheVersions:
+    """
+    Rozgłaszanie unieważnień cache'y między workerami przez liczniki wersji w MongoDB.
+
+    Każdy cache w pamięci procesu ma nazwę i licznik w kolekcji `cache_versions`. Worker, który
+    zmienia dane, zwiększa licznik (`publish`/`bump`), a pozostałe workery co `interval` sekund
+    porównują liczniki z ostatnio widzianymi i przy zmianie wywołują zarejestrowane unieważnienia.
+    Dane w innych workerach są więc nieaktualne najwyżej przez `interval` sekund.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._callbacks = {}
+        self._seen = {}
+        self._task: asyncio.Task = None
+
+    def register(self, name: str, callback):
+        """Rejestruje funkcję unieważniającą cache o danej nazwie."""
+        self._callbacks.setdefault(name, []).append(callback)
+
+    async def bump(self, db: AsyncIOMotorDatabase, name: str):
+        """
+        Zwiększa licznik wersji, żeby pozostałe workery unieważniły swój cache.
+
+        Args:
+            db (AsyncIOMotorDatabase): Obiekt bazy danych.
+            name (str): Nazwa cache'u.
+        """
+        doc = await db.cache_versions.find_one_and_update(
+            {"_id": name}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        # Własna zmiana jest już unieważniona lokalnie - ale przeskok licznika oznacza, że w międzyczasie
+        # zmienił dane inny worker, a tej zmiany ten worker jeszcze nie zauważył
+        if doc["version"] != self._seen.get(name, 0) + 1:
+            self._invalidate(name)
+        self._seen[name] = doc["version"]
+
+    async def publish(self, db: AsyncIOMotorDatabase, name: str):
+        """Unieważnia cache w tym workerze i rozgłasza unieważnienie do pozostałych."""
+        self._invalidate(name)
+        await self.bump(db, name)
+
+    def _invalidate(self, name: str):
+        for callback in self._callbacks.get(name, []):
+            callback()
+
+    async def sync(self, db: AsyncIOMotorDatabase):
+        """Porównuje liczniki z bazy z ostatnio widzianymi i unieważnia cache'e, które zmienił inny worker."""
+        async for doc in db.cache_versions.find({"_id": {"$in": list(self._callbacks)}}):
+            name, version = doc["_id"], doc["version"]
+            # Brak licznika = wersja 0 (nikt jeszcze nie zmieniał danych)
+            if self._seen.get(name, 0) != version:
+                self._seen[name] = version
+                self._invalidate(name)
+
+    async def _run(self, db: AsyncIOMotorDatabase):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sync(db)
+            except Exception as e:
+                print(f"⚠️ Nie udało się odczytać wersji cache'y: {e}")
+
+    async def start(self, db: AsyncIOMotorDatabase):
+        """Zapamiętuje bieżące wersje i uruchamia okresowe sprawdzanie (wywoływane w lifespan każdego workera)."""
+        try:
+            await self.sync(db)
+        except Exception as e:
+            print(f"⚠️ Nie udało się odczytać wersji cache'y: {e}")
+        self._task = asyncio.create_task(self._run(db))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+cache_versions = CacheVersions(CACHE_SYNC_INTERVAL)
@@ -0,0 +1,119 @@
+import base64
+import binascii
+from datetime import date
+from bson import json_util
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCollection
+from app.utils.tools import day_start
+
+
+def encode_cursor(doc: dict, fields: tuple) -> str:
+    """
+    Tworzy nieprzezroczysty kursor z wartości pól sortowania ostatniego dokumentu strony.
+
+    Args:
+        doc (dict): Ostatni dokument zwróconej strony.
+        fields (tuple): Pola, po których sortujemy (np. ("date", "_id")).
+
+    Returns:
+        str: Kursor w postaci base64 (url-safe).
+    """
+    raw = json_util.dumps([doc[field] for field in fields])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: tuple) -> list:
+    """
+    Odczytuje wartości pól sortowania z kursora.
+
+    Args:
+        cursor (str): Kursor z poprzedniej strony.
+        fields (tuple): Pola, po których sortujemy.
+
+    Raises:
+        HTTPException: Jeśli kursor jest nieprawidłowy, zgłasza błąd 400 (Bad Request).
+
+    Returns:
+        list: Wartości pól w kolejności `fields`.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json_util.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_filter(fields: tuple, values: list) -> dict:
+    """
+    Buduje filtr "wszystko po (values)" dla sortowania rosnącego po `fields`.
+
+    Dla pól (a, b) daje: a > va OR (a == va AND b > vb).
+
+    Args:
+        fields (tuple): Pola sortowania.
+        values (list): Wartości z kursora.
+
+    Returns:
+        dict: Filtr MongoDB.
+    """
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {fields[j]: values[j] for j in range(i)}
+        clause[field] = {"$gt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def date_range_filter(date_from: date = None, date_to: date = None) -> dict:
+    """
+    Buduje filtr zakresu dat (obustronnie domknięty) dla pola `date` w kalendarzu.
+
+    Args:
+        date_from (date, optional): Pierwszy dzień zakresu.
+        date_to (date, optional): Ostatni dzień zakresu.
+
+    Returns:
+        dict: Warunek dla pola `date` lub pusty słownik.
+    """
+    condition = {}
+    if date_from is not None:
+        condition["$gte"] = day_start(date_from)
+    if date_to is not None:
+        condition["$lte"] = day_start(date_to)
+    return condition
+
+
+async def paginate(collection: AsyncIOMotorCollection, query: dict, fields: tuple, cursor: str = None,
+                   limit: int = 100, projection: dict = None) -> tuple:
+    """
+    Pobiera jedną stronę dokumentów metodą keyset (bez `skip`), sortując rosnąco po `fields`.
+
+    Koszt zapytania zależy od rozmiaru strony, o ile istnieje indeks zgodny z filtrem i sortowaniem.
+
+    Args:
+        collection (AsyncIOMotorCollection): Kolekcja do odpytania.
+        query (dict): Filtr bazowy.
+        fields (tuple): Pola sortowania; ostatnie musi być unikalne (zwykle `_id`).
+        cursor (str, optional): Kursor z poprzedniej strony.
+        limit (int): Maksymalna liczba dokumentów na stronie.
+        projection (dict, optional): Projekcja; musi zawierać pola z `fields`.
+
+    Returns:
+        tuple: (lista dokumentów, kursor następnej strony lub None).
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(fields, decode_cursor(cursor, fields))]}
+
+    docs = await collection.find(query, projection) \
+        .sort([(field, 1) for field in fields]) \
+        .limit(limit + 1) \
+        .to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], fields)
+    return docs, next_cursor
@@ -0,0 +1,157 @@
+from datetime import date, timedelta
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from app.config import DEFAULT_MAX_STEPS, PLAN_MAX_DAYS
+from app.schemas import CalendarPlan, CalendarPlanDelete
+from app.utils.tools import day_start
+from app.utils.calendar_ids import day_filter, day_insert_fields
+from app.utils.versioning import touch
+
+# Pola ustawiane na nowo utworzonych dniach (kroki nieznane - dzień nie trafia do zestawień)
+NEW_DAY_DEFAULTS = {"steps": None, "maxSteps": DEFAULT_MAX_STEPS}
+
+
+def plan_days(start_date: date, stop_date: date) -> list:
+    """
+    Zwraca kolejne dni zakresu planu (obustronnie domkniętego).
+
+    Raises:
+        HTTPException: Jeśli zakres jest pusty lub dłuższy niż PLAN_MAX_DAYS, zgłasza błąd 400 (Bad Request).
+    """
+    length = (stop_date - start_date).days + 1
+    if length < 1:
+        raise HTTPException(status_code=400, detail="stopDate must not be before startDate")
+    if length > PLAN_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Plan too long (max {PLAN_MAX_DAYS} days)")
+    return [start_date + timedelta(days=offset) for offset in range(length)]
+
+
+def is_scheduled(offset: int, interval_days: int) -> bool:
+    """Czy ćwiczenie z przerwą `interval_days` dni wypada `offset` dni po starcie planu."""
+    return offset % ((interval_days or 0) + 1) == 0
+
+
+def _scheduled_entries(plan: CalendarPlan, offset: int) -> list:
+    """Pozycje planu (godzina, ćwiczenie) przypadające na dany dzień planu."""
+    return [
+        (slot.hour, exercise)
+        for slot in plan.hours
+        for exercise in slot.exercises
+        if is_scheduled(offset, exercise.intervalBetween_days)
+    ]
+
+
+def create_plan_operations(user_id: str, plan: CalendarPlan) -> tuple:
+    """
+    Rozpisuje plan na operacje `bulk_write`: jeden upsert z `$push` na każdy dzień z ćwiczeniami.
+
+    Args:
+        user_id (str): ID użytkownika.
+        plan (CalendarPlan): Plan od startDate do stopDate.
+
+    Returns:
+        tuple: (dni, operacje `UpdateOne` dla kolekcji `calendar`) - i-ta operacja dotyczy i-tego dnia.
+    """
+    days, operations = [], []
+    for offset, day in enumerate(plan_days(plan.startDate, plan.stopDate)):
+        entries = [
+            {**exercise.model_dump(), "hour": hour, "id": str(ObjectId())}
+            for hour, exercise in _scheduled_entries(plan, offset)
+        ]
+        if not entries:
+            continue
+        days.append(day)
+        operations.append(UpdateOne(
+            day_filter(user_id, day_start(day)),
+            touch({"$push": {"exercises": {"$each": entries}},
+                   "$setOnInsert": {**NEW_DAY_DEFAULTS, **day_insert_fields(user_id, day_start(day))}}),
+            upsert=True,
+        ))
+    return days, operations
+
+
+def modify_plan_operations(user_id: str, plan: CalendarPlan) -> tuple:
+    """
+    Rozpisuje zmianę planu na operacje `bulk_write` (wykonywane po kolei, `ordered=True`).
+
+    Dla każdego dnia: upsert dnia, nadpisanie istniejących pozycji (godzina, ćwiczenie) przez
+    `arrayFilters` i `$push` tych, których jeszcze nie ma. Identyfikatory i stan istniejących
+    pozycji są zachowane, o ile nie zostały podane w zmianie. Wersję dnia podbijają tylko
+    operacje zmieniające ćwiczenia - sam upsert tworzy pusty dzień.
+
+    Args:
+        user_id (str): ID użytkownika.
+        plan (CalendarPlan): Zmiany od startDate do stopDate.
+
+    Returns:
+        tuple: (dni, operacje `UpdateOne` dla kolekcji `calendar`) - i-ta operacja dotyczy i-tego dnia.
+    """
+    days, operations = [], []
+    for offset, day in enumerate(plan_days(plan.startDate, plan.stopDate)):
+        entries = _scheduled_entries(plan, offset)
+        if not entries:
+            continue
+        first = len(operations)
+        query = day_filter(user_id, day_start(day))
+        on_insert = {**NEW_DAY_DEFAULTS, "exercises": [], **day_insert_fields(user_id, day_start(day))}
+        operations.append(UpdateOne(query, {"$setOnInsert": on_insert}, upsert=True))
+        for hour, exercise in entries:
+            fields = exercise.model_dump(exclude_unset=True, exclude={"exercise_id", "hour"})
+            match = {"hour": hour, "exercise_id": exercise.exercise_id}
+            if fields:
+                operations.append(UpdateOne(
+                    query,
+                    touch({"$set": {f"exercises.$[entry].{field}": value for field, value in fields.items()}}),
+                    array_filters=[{f"entry.{key}": value for key, value in match.items()}],
+                ))
+            operations.append(UpdateOne(
+                {**query, "exercises": {"$not": {"$elemMatch": match}}},
+                touch({"$push": {"exercises": {**exercise.model_dump(), "hour": hour, "id": str(ObjectId())}}}),
+            ))
+        days.extend([day] * (len(operations) - first))
+    return days, operations
+
+
+def _delete_plan_condition(plan: CalendarPlanDelete) -> dict:
+    """Warunek pozycji usuwanych z dnia (None - wszystkie ćwiczenia dnia)."""
+    if not plan.hours:
+        return None
+    conditions = []
+    for slot in plan.hours:
+        condition = {"hour": slot.hour}
+        if slot.exercise_ids:
+            condition["exercise_id"] = {"$in": slot.exercise_ids}
+        conditions.append(condition)
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def delete_plan_filter(plan: CalendarPlanDelete) -> dict:
+    """
+    Zawężenie filtra dni do tych, z których coś zostanie usunięte.
+
+    Dni bez pasujących ćwiczeń nie są zapisywane, więc ich `version` i `updated_at` się nie zmieniają.
+
+    Returns:
+        dict: Warunek na `exercises` dla `update_many`.
+    """
+    condition = _delete_plan_condition(plan)
+    if condition is None:
+        return {"exercises.0": {"$exists": True}}
+    return {"exercises": {"$elemMatch": condition}}
+
+
+def delete_plan_update(plan: CalendarPlanDelete) -> dict:
+    """
+    Buduje aktualizację usuwającą ćwiczenia planu z dni zakresu (kroki zostają).
+
+    Bez `hours` czyszczone są wszystkie ćwiczenia dni; z `hours` - tylko podane godziny
+    (i opcjonalnie tylko wskazane ćwiczenia).
+
+    Returns:
+        dict: Aktualizacja dla `update_many`.
+    """
+    condition = _delete_plan_condition(plan)
+    if condition is None:
+        return {"$set": {"exercises": []}}
+    return {"$pull": {"exercises": condition}}
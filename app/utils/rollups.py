@@ -0,0 +1,200 @@
+import asyncio
+import argparse
+from datetime import datetime, date, timedelta
+from pymongo import UpdateOne
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.utils.tools import day_start
+
+# Format klucza okresu - zgodny z $dateToString używanym przy przebudowie
+GRANULARITIES = {
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+}
+
+
+def period_start(day: date, granularity: str) -> date:
+    """Zwraca pierwszy dzień okresu (poniedziałek tygodnia ISO lub 1. dzień miesiąca)."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def period_end(day: date, granularity: str) -> date:
+    """Zwraca ostatni dzień okresu zawierającego `day`."""
+    if granularity == "week":
+        return period_start(day, granularity) + timedelta(days=6)
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def goal_hit(doc: dict) -> bool:
+    """Czy dzień osiągnął cel kroków."""
+    steps, max_steps = doc.get("steps"), doc.get("maxSteps")
+    return steps is not None and bool(max_steps) and steps >= max_steps
+
+
+def _contributions(doc: dict) -> dict:
+    """
+    Wyznacza wkład jednego dnia w zestawienia tygodniowe i miesięczne.
+
+    Dni bez zapisanych kroków nie wchodzą do zestawień.
+    """
+    if not doc or doc.get("steps") is None:
+        return {}
+    day = doc["date"].date()
+    values = {"sum": doc["steps"], "days": 1, "goalHits": int(goal_hit(doc))}
+    return {
+        (granularity, day.strftime(fmt), period_start(day, granularity)): values
+        for granularity, fmt in GRANULARITIES.items()
+    }
+
+
+def rollup_operations(user_id: str, before: dict, after: dict) -> list:
+    """
+    Buduje operacje `$inc` przenoszące zmianę dnia (before -> after) na zestawienia.
+
+    `max` jest aktualizowany przez `$max`, więc po zmniejszeniu kroków może być zawyżony
+    do czasu przebudowy (`rebuild_rollups`).
+
+    Args:
+        user_id (str): ID użytkownika.
+        before (dict): Dokument dnia przed zmianą (None przy tworzeniu).
+        after (dict): Dokument dnia po zmianie (None przy usuwaniu).
+
+    Returns:
+        list: Lista operacji `UpdateOne` dla kolekcji `steps_rollups`.
+    """
+    old, new = _contributions(before), _contributions(after)
+    operations = []
+    for key in old.keys() | new.keys():
+        granularity, period, start = key
+        old_values = old.get(key, {})
+        new_values = new.get(key, {})
+        inc = {
+            field: new_values.get(field, 0) - old_values.get(field, 0)
+            for field in ("sum", "days", "goalHits")
+        }
+        update = {"$setOnInsert": {"user_id": user_id, "granularity": granularity, "period": period,
+                                   "start": day_start(start)}}
+        if any(inc.values()):
+            update["$inc"] = inc
+        if key in new:
+            update["$max"] = {"max": new_values["sum"]}
+        if len(update) == 1:
+            continue
+        operations.append(UpdateOne({"_id": f"{user_id}:{granularity}:{period}"}, update, upsert=True))
+    return operations
+
+
+async def update_rollups(db: AsyncIOMotorDatabase, user_id: str, before: dict, after: dict):
+    """
+    Przyrostowo aktualizuje zestawienia kroków po zmianie jednego dnia.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        user_id (str): ID użytkownika.
+        before (dict): Dokument dnia przed zmianą (None przy tworzeniu).
+        after (dict): Dokument dnia po zmianie (None przy usuwaniu).
+    """
+    operations = rollup_operations(user_id, before, after)
+    if operations:
+        await db.steps_rollups.bulk_write(operations, ordered=False)
+
+
+def _rebuild_pipeline(granularity: str, match: dict, rebuilt_at: datetime) -> list:
+    """Pipeline agregacji liczący zestawienia danej granulacji i zapisujący je przez $merge."""
+    if granularity == "week":
+        start = {"$dateFromParts": {"isoWeekYear": {"$isoWeekYear": "$first"}, "isoWeek": {"$isoWeek": "$first"}}}
+    else:
+        start = {"$dateFromParts": {"year": {"$year": "$first"}, "month": {"$month": "$first"}}}
+
+    return [
+        {"$match": {**match, "steps": {"$ne": None}}},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "period": {"$dateToString": {"format": GRANULARITIES[granularity], "date": "$date"}},
+            },
+            "first": {"$min": "$date"},
+            "sum": {"$sum": "$steps"},
+            "days": {"$sum": 1},
+            "max": {"$max": "$steps"},
+            "goalHits": {"$sum": {"$cond": [
+                {"$and": [{"$gt": ["$maxSteps", 0]}, {"$gte": ["$steps", "$maxSteps"]}]}, 1, 0
+            ]}},
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.user_id", f":{granularity}:", "$_id.period"]},
+            "user_id": "$_id.user_id",
+            "granularity": granularity,
+            "period": "$_id.period",
+            "start": start,
+            "sum": 1,
+            "days": 1,
+            "max": 1,
+            "goalHits": 1,
+            "rebuilt_at": {"$literal": rebuilt_at},
+        }},
+        {"$merge": {"into": "steps_rollups", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+async def rebuild_rollups(db: AsyncIOMotorDatabase, user_id: str = None, date_from: date = None,
+                          date_to: date = None):
+    """
+    Przelicza zestawienia od zera na podstawie kolekcji `calendar`.
+
+    Zakres dat jest rozszerzany do pełnych tygodni/miesięcy. Przeliczone zestawienia zastępują
+    istniejące przez $merge (bez wcześniejszego usuwania - odczyty nie widzą pustych okresów),
+    a potem usuwane są tylko zestawienia okresów, w których nie ma już dni z krokami.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        user_id (str, optional): Ogranicza przebudowę do jednego użytkownika.
+        date_from (date, optional): Pierwszy zmieniony dzień.
+        date_to (date, optional): Ostatni zmieniony dzień.
+    """
+    for granularity in GRANULARITIES:
+        match, rollup_filter = {}, {"granularity": granularity}
+        if user_id is not None:
+            match["user_id"] = rollup_filter["user_id"] = user_id
+        date_condition, start_condition = {}, {}
+        if date_from is not None:
+            date_condition["$gte"] = start_condition["$gte"] = day_start(period_start(date_from, granularity))
+        if date_to is not None:
+            date_condition["$lte"] = day_start(period_end(date_to, granularity))
+            start_condition["$lte"] = day_start(period_start(date_to, granularity))
+        if date_condition:
+            match["date"] = date_condition
+            rollup_filter["start"] = start_condition
+
+        rebuilt_at = datetime.utcnow()
+        await db.calendar.aggregate(_rebuild_pipeline(granularity, match, rebuilt_at)).to_list(length=None)
+        # Okresy pominięte przez agregację: przeliczone wcześniej, utworzone przyrostowo (bez `rebuilt_at`)
+        # albo wyzerowane - w zakresie nie ma już ich dni z krokami
+        await db.steps_rollups.delete_many({**rollup_filter, "$or": [
+            {"rebuilt_at": {"$lt": rebuilt_at}}, {"rebuilt_at": {"$exists": False}}, {"days": {"$lte": 0}},
+        ]})
+
+
+async def _main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.config import MONGO_URL
+
+    parser = argparse.ArgumentParser(description="Przebudowa kolekcji steps_rollups na podstawie calendar")
+    parser.add_argument("--user", help="ID użytkownika (domyślnie wszyscy)")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="Pierwszy dzień (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Ostatni dzień (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    try:
+        started = datetime.utcnow()
+        await rebuild_rollups(client["fitness_app"], args.user, args.date_from, args.date_to)
+        print(f"✅ Przebudowano steps_rollups w {datetime.utcnow() - started}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from fastapi import HTTPException, status, Depends
 from app.database import get_db
 
@@ -7,32 +9,36 @@ def check_role(current_user: dict, required_role: str):
     Sprawdza, czy użytkownik posiada wymaganą rolę.
 
     Args:
-        current_user (dict): Dane użytkownika, który jest aktualnie zalogowany.
+        current_user (UserInDB | dict): Dane użytkownika, który jest aktualnie zalogowany (z get_current_user).
         required_role (str): Rola, którą użytkownik musi posiadać.
 
     Raises:
         HTTPException: Jeśli użytkownik nie ma wymaganej roli, zgłasza błąd 403 (Forbidden).
     """
-    if required_role not in current_user.get("role", []):
+    role = current_user.get("role") if isinstance(current_user, dict) else getattr(current_user, "role", None)
+    if role != required_role:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Insufficient permissions. Required role: {required_role}",
         )
 
-async def check_email(required_email: str, db=Depends(get_db)):
+@contextmanager
+def check_email(required_email: str):
     """
-    Sprawdza, czy email jest już używany przez innego użytkownika w bazie danych.
+    Zamienia naruszenie unikalnego indeksu `users.email` na błąd HTTP.
+
+    Unikalność gwarantuje indeks w bazie, więc zamiast odczytu przed zapisem
+    obejmujemy nim sam zapis (insert lub update).
 
     Args:
-        required_email (str): Email, który ma zostać sprawdzony.
-        db: Obiekt bazy danych.
+        required_email (str): Email, który jest zapisywany.
 
     Raises:
         HTTPException: Jeśli email jest już w użyciu, zgłasza błąd 400 (Bad Request).
     """
-    print(f"🔗 Połączono z bazą: {db}")  # Debugging
-    existing_user = await db.users.find_one({"email": required_email})
-    if existing_user:
+    try:
+        yield
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Email already in use")
 
 async def check_id(required_id: str, db=Depends(get_db)):
@@ -0,0 +1,122 @@
+import json
+from datetime import datetime, date
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from app.config import DEBUG
+from app.schemas import CalendarResponse, ExercisePerformanceResponse, UserProfileResponse, StepsHistoryResponse, \
+    ExerciseResponse
+
+try:
+    import orjson
+except ImportError:  # orjson jest opcjonalny - bez niego działa wolniejszy moduł json
+    orjson = None
+
+
+def _default(value):
+    """Typy spoza JSON-a występujące w dokumentach Mongo."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    """
+    Serializuje słowniki/listy (także z ObjectId i datetime) prosto do bajtów JSON.
+
+    Args:
+        content: Dane do wysłania.
+
+    Returns:
+        bytes: JSON w UTF-8.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """Odpowiedź JSON renderowana przez orjson (jeśli jest zainstalowany)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _field_defaults(model, exclude=()) -> dict:
+    """Pola modelu odpowiedzi z wartościami domyślnymi - kolejność pól jak w modelu."""
+    return {
+        name: None if field.is_required() else field.get_default(call_default_factory=True)
+        for name, field in model.model_fields.items()
+        if name not in exclude
+    }
+
+
+CALENDAR_FIELDS = _field_defaults(CalendarResponse, exclude=("id", "exercises"))
+EXERCISE_FIELDS = _field_defaults(ExercisePerformanceResponse)
+STEPS_HISTORY_FIELDS = _field_defaults(StepsHistoryResponse)
+EXERCISE_RESPONSE_FIELDS = _field_defaults(ExerciseResponse, exclude=("id",))
+
+
+def calendar_item(doc: dict) -> dict:
+    """
+    Zamienia dokument dnia z kolekcji `calendar` na słownik w kształcie `CalendarResponse` - bez budowania modelu.
+
+    Args:
+        doc (dict): Dokument z bazy (z `_id`).
+
+    Returns:
+        dict: Dane gotowe do `dumps`.
+    """
+    item = {key: doc.get(key, default) for key, default in CALENDAR_FIELDS.items()}
+    item["id"] = str(doc["_id"])
+    exercises = doc.get("exercises", [])
+    item["exercises"] = None if exercises is None else [
+        {key: ex.get(key, default) for key, default in EXERCISE_FIELDS.items()} for ex in exercises
+    ]
+    return item
+
+
+def steps_history_item(doc: dict) -> dict:
+    """Zamienia dokument dnia na słownik w kształcie `StepsHistoryResponse`."""
+    return {key: doc.get(key, default) for key, default in STEPS_HISTORY_FIELDS.items()}
+
+
+def exercise_item(doc: dict) -> dict:
+    """Zamienia dokument ćwiczenia z katalogu na słownik w kształcie `ExerciseResponse`."""
+    item = {"id": str(doc["_id"])}
+    item.update((key, doc.get(key, default)) for key, default in EXERCISE_RESPONSE_FIELDS.items())
+    return item
+
+
+def user_profile_item(user: dict) -> dict:
+    """Zamienia dokument użytkownika na słownik w kształcie `UserProfileResponse`."""
+    return {"username": user["username"], "email": user["email"], "id": str(user["_id"]), "role": user["role"]}
+
+
+_adapters = {}
+
+
+def fast_response(content, model=None, status_code: int = 200, headers: dict = None) -> FastJSONResponse:
+    """
+    Zwraca dane jako gotową odpowiedź JSON z pominięciem `response_model`.
+
+    FastAPI nie waliduje ani nie serializuje ponownie zwróconego obiektu Response, więc dane
+    przechodzą z dokumentu Mongo do bajtów bez tworzenia modeli Pydantic. W trybie DEBUG
+    dane są dodatkowo sprawdzane modelem odpowiedzi, żeby wychwycić rozjazd ze schematem.
+
+    Args:
+        content: Dane odpowiedzi (słowniki/listy).
+        model: Typ odpowiedzi (np. `Page[CalendarResponse]`) używany do walidacji w trybie DEBUG.
+        status_code (int): Kod odpowiedzi.
+        headers (dict): Dodatkowe nagłówki (np. ETag).
+
+    Returns:
+        FastJSONResponse: Odpowiedź z zserializowanymi danymi.
+    """
+    if DEBUG and model is not None:
+        if model not in _adapters:
+            _adapters[model] = TypeAdapter(model)
+        _adapters[model].validate_python(content)
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
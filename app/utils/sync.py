@@ -0,0 +1,127 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from app.config import SYNC_OVERLAP_SECONDS, SYNC_TOMBSTONE_TTL_DAYS
+from app.utils.pagination import keyset_filter
+
+# Źródła zmian w tokenie synchronizacji i pola, po których są sortowane
+SYNC_SOURCES = {
+    "calendar": ("updated_at", "_id"),
+    "exercises": ("updated_at", "_id"),
+    "tombstones": ("deleted_at", "_id"),
+}
+
+
+async def record_tombstone(db: AsyncIOMotorDatabase, kind: str, doc_id, user_id: str = None, session=None):
+    """
+    Zapisuje ślad usunięcia dokumentu, żeby klienci synchronizujący zmiany przyrostowo też go usunęli.
+
+    Args:
+        db (AsyncIOMotorDatabase): Obiekt bazy danych.
+        kind (str): Rodzaj dokumentu ("calendar" lub "exercise").
+        doc_id: ID usuniętego dokumentu.
+        user_id (str, optional): Właściciel; None dla wspólnego katalogu ćwiczeń.
+        session (optional): Sesja MongoDB, jeśli zapis jest częścią transakcji.
+    """
+    await db.tombstones.insert_one({
+        "kind": kind, "doc_id": str(doc_id), "user_id": user_id, "deleted_at": datetime.utcnow(),
+    }, session=session)
+
+
+def encode_token(positions: dict) -> str:
+    """Tworzy nieprzezroczysty token z pozycji (wartości pól sortowania) w każdym źródle zmian."""
+    raw = json_util.dumps(positions)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> dict:
+    """
+    Odczytuje pozycje w źródłach zmian z tokenu synchronizacji.
+
+    Raises:
+        HTTPException: Jeśli token jest nieprawidłowy, zgłasza błąd 400 (Bad Request).
+
+    Returns:
+        dict: Pozycja [wartość pola czasu, _id lub None] dla każdego źródła.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        positions = json_util.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    if not isinstance(positions, dict) or set(positions) != set(SYNC_SOURCES) \
+            or positions["tombstones"] is None or positions["tombstones"][0] is None \
+            or not all(_valid_position(position) for position in positions.values()):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return positions
+
+
+def _valid_position(position) -> bool:
+    """
+    Czy pozycja ma postać None, [datetime, _id lub None] albo [None, _id] (wewnątrz dokumentów bez pola
+    czasu - sprzed uzupełnienia `updated_at`). Dni w trybie `day` mają `_id` tekstowe.
+    """
+    if position is None:
+        return True
+    if not isinstance(position, list) or len(position) != 2:
+        return False
+    time, doc_id = position
+    if doc_id is not None and not isinstance(doc_id, (ObjectId, str)):
+        return False
+    return isinstance(time, datetime) or (time is None and doc_id is not None)
+
+
+def token_expired(positions: dict, now: datetime) -> bool:
+    """Czy token jest starszy niż czas przechowywania śladów usunięć (wtedy potrzebna pełna synchronizacja)."""
+    return positions["tombstones"][0] < now - timedelta(days=SYNC_TOMBSTONE_TTL_DAYS)
+
+
+def initial_positions(now: datetime) -> dict:
+    """Pozycje pełnej synchronizacji: dni i katalog od początku, usunięcia od teraz."""
+    return {"calendar": None, "exercises": None, "tombstones": [now - timedelta(seconds=SYNC_OVERLAP_SECONDS), None]}
+
+
+async def changes_page(collection: AsyncIOMotorCollection, query: dict, fields: tuple, position: list,
+                       limit: int, started: datetime) -> tuple:
+    """
+    Pobiera kolejną porcję zmian jednego źródła (keyset po polu czasu i `_id`).
+
+    Koszt zależy od liczby zmian od `position`, a nie od rozmiaru historii - o ile istnieje
+    indeks zgodny z `query` i `fields`. Dokumenty bez pola czasu (sprzed uzupełnienia `updated_at`
+    przez `python -m app.migrations --backfill`) są sortowane na początku i trafiają do pełnej
+    synchronizacji. Gdy porcja wyczerpuje zmiany, nowa pozycja cofa się do `started - SYNC_OVERLAP_SECONDS`: zapisy zatwierdzone z opóźnieniem (ze znacznikiem czasu
+    sprzed odczytu) trafią do następnej synchronizacji, a powtórzone dokumenty klient po prostu nadpisze.
+
+    Args:
+        collection (AsyncIOMotorCollection): Kolekcja źródła.
+        query (dict): Filtr bazowy (np. użytkownik).
+        fields (tuple): (pole czasu, "_id").
+        position (list): Pozycja z tokenu: [czas, _id] (po konkretnym dokumencie), [czas, None] (od chwili) lub None.
+        limit (int): Maksymalna liczba dokumentów.
+        started (datetime): Początek obsługi żądania.
+
+    Returns:
+        tuple: (dokumenty, nowa pozycja, czy są kolejne zmiany).
+    """
+    if position is not None:
+        if position[1] is None:
+            condition = {fields[0]: {"$gte": position[0]}}
+        elif position[0] is None:
+            # Wewnątrz dokumentów bez pola czasu: kolejne z nich po `_id`, potem wszystkie z polem czasu
+            condition = {"$or": [{fields[0]: None, fields[1]: {"$gt": position[1]}}, {fields[0]: {"$ne": None}}]}
+        else:
+            condition = keyset_filter(fields, position)
+        query = {"$and": [query, condition]}
+
+    docs = await collection.find(query) \
+        .sort([(field, 1) for field in fields]) \
+        .limit(limit + 1) \
+        .to_list(length=limit + 1)
+
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, [docs[-1].get(field) for field in fields], True
+    return docs, [started - timedelta(seconds=SYNC_OVERLAP_SECONDS), None], False
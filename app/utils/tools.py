@@ -1,41 +1,102 @@
-from app.database import get_db
-from fastapi import Depends, HTTPException
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from contextlib import contextmanager
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, date, time
 
-async def check_exercise(required_exercise: str, db: AsyncIOMotorDatabase):
+@contextmanager
+def check_exercise(required_exercise: str):
     """
-    Sprawdza, czy ćwiczenie jest już w bazie danych.
+    Zamienia naruszenie unikalnego indeksu `exercises.name` na błąd HTTP.
+
+    Unikalność gwarantuje indeks w bazie, więc nie wykonujemy dodatkowego odczytu
+    przed zapisem - zapis po prostu kończy się błędem DuplicateKeyError.
 
     Args:
-        required_exercise (str): ćwiczenie, który ma zostać sprawdzone.
-        db: Obiekt bazy danych.
+        required_exercise (str): Nazwa zapisywanego ćwiczenia.
 
     Raises:
         HTTPException: Jeśli ćwiczenie jest już w użyciu, zgłasza błąd 400 (Bad Request).
     """
-    print(f"🔗 Połączono z bazą: {db}")  # Debug print, można usunąć w produkcji
-    existing = await db.exercises.find_one({"name": required_exercise})
-    if existing:
+    try:
+        yield
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail=f"Exercise '{required_exercise}' already exists.")
 
-async def check_day(required_day: datetime, db: AsyncIOMotorDatabase):
+@contextmanager
+def check_day(required_day: datetime):
     """
-    Sprawdza, czy dzień jest już w bazie danych.
+    Zamienia naruszenie unikalnego indeksu `calendar (user_id, date)` na błąd HTTP.
 
     Args:
-        required_day (str): dzień, który ma zostać sprawdzony.
-        db: Obiekt bazy danych.
+        required_day (datetime): Dzień, który jest zapisywany.
 
     Raises:
         HTTPException: Jeśli dzień jest już w kalendarzu, zgłasza błąd 400 (Bad Request).
     """
-    print(f"🔗 Połączono z bazą: {db}")  # Debug print, można usunąć w produkcji
-    existing = await db.calendar.find_one({"date": required_day})
-    if existing:
+    try:
+        yield
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail=f"Day '{required_day}' already exists.")
 
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Sprawdza, czy nagłówek If-None-Match obejmuje podany ETag.
+
+    Args:
+        if_none_match (str): Wartość nagłówka (może zawierać listę ETagów lub "*").
+        etag (str): Aktualny ETag zasobu.
+
+    Returns:
+        bool: True, jeśli klient ma aktualną wersję (można odpowiedzieć 304).
+    """
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def day_start(day: date) -> datetime:
+    """Zwraca początek podanego dnia - tak przechowujemy `date` w kalendarzu."""
+    return datetime.combine(day, time.min)
+
 def today():
-    today_date = date.today()
-    datetime_with_zero_time = datetime.combine(today_date, time.min)
-    return datetime_with_zero_time
+    return day_start(date.today())
+
+
+def apply_update(doc: dict, update: dict, inserted: bool = False) -> dict:
+    """
+    Odtwarza lokalnie wynik prostej aktualizacji MongoDB ($set, $inc, $setOnInsert).
+
+    Pozwala pobrać dokument sprzed zmiany (ReturnDocument.BEFORE) i nie czytać go ponownie po zapisie.
+
+    Args:
+        doc (dict): Dokument przed aktualizacją (przy upsercie - pola z filtra).
+        update (dict): Operatory aktualizacji; obsługiwane są ścieżki z kropkami.
+        inserted (bool): Czy dokument został właśnie utworzony (stosuje $setOnInsert).
+
+    Returns:
+        dict: Nowy dokument po aktualizacji.
+    """
+    result = {**doc}
+
+    def set_path(path, value):
+        target = result
+        *parents, last = path.split(".")
+        for part in parents:
+            target[part] = {**(target.get(part) or {})}
+            target = target[part]
+        target[last] = value
+
+    def get_path(path):
+        value = result
+        for part in path.split("."):
+            value = (value or {}).get(part)
+        return value
+
+    if inserted:
+        for path, value in update.get("$setOnInsert", {}).items():
+            set_path(path, value)
+    for path, value in update.get("$set", {}).items():
+        set_path(path, value)
+    for path, value in update.get("$inc", {}).items():
+        set_path(path, (get_path(path) or 0) + value)
+    return result
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+def touch(update: dict, now: datetime = None) -> dict:
+    """
+    Dokłada do aktualizacji dnia podbicie licznika `version` i znacznik `updated_at`.
+
+    Każdy zapis do kolekcji `calendar` przechodzi przez tę funkcję, więc `version` rośnie przy
+    każdej zmianie dnia (przy upsercie nowy dzień dostaje wersję 1).
+
+    Args:
+        update (dict): Operatory aktualizacji ($set, $inc, $push...).
+        now (datetime): Czas zmiany (domyślnie teraz, UTC).
+
+    Returns:
+        dict: Nowa aktualizacja z `$inc.version` i `$set.updated_at`.
+    """
+    return {
+        **update,
+        "$inc": {**update.get("$inc", {}), "version": 1},
+        "$set": {**update.get("$set", {}), "updated_at": now or datetime.utcnow()},
+    }
+
+
+def day_etag(doc: dict) -> str:
+    """ETag dnia kalendarza - numer wersji dokumentu (dni sprzed wersjonowania mają wersję 0)."""
+    return f'"{doc.get("version") or 0}"'
+
+
+def expected_version(if_match: Optional[str]) -> Optional[int]:
+    """
+    Odczytuje oczekiwaną wersję z nagłówka If-Match.
+
+    Args:
+        if_match (str): Wartość nagłówka, np. '"3"' lub 'W/"3"'.
+
+    Raises:
+        HTTPException: Jeśli nagłówek nie jest ETagiem dnia, zgłasza błąd 412 (Precondition Failed).
+
+    Returns:
+        int: Wersja, którą klient widział ostatnio; None, jeśli nagłówka nie ma lub to "*".
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise HTTPException(status_code=412, detail="Invalid If-Match header")
+    return int(tag)
+
+
+def version_filter(query: dict, if_match: Optional[str]) -> dict:
+    """
+    Zawęża filtr zapisu do wersji z If-Match - zapis i sprawdzenie wersji to jedna atomowa operacja.
+
+    Args:
+        query (dict): Filtr dokumentu dnia.
+        if_match (str): Nagłówek If-Match (opcjonalny).
+
+    Returns:
+        dict: Filtr z warunkiem na `version`.
+    """
+    version = expected_version(if_match)
+    if version is None:
+        return query
+    # Wersja 0 to dokument bez pola `version` - {"version": None} dopasowuje brakujące pole
+    return {**query, "version": version or None}
+
+
+async def raise_write_failed(collection: AsyncIOMotorCollection, query: dict, if_match: Optional[str],
+                             detail: str = "Calendar entry not found"):
+    """
+    Ustala, dlaczego warunkowy zapis niczego nie zmienił (odczyt tylko na ścieżce błędu).
+
+    Args:
+        collection (AsyncIOMotorCollection): Kolekcja dni.
+        query (dict): Filtr dokumentu bez warunku na wersję.
+        if_match (str): Nagłówek If-Match z żądania.
+        detail (str): Komunikat błędu 404.
+
+    Raises:
+        HTTPException: 412 (Precondition Failed) z aktualnym ETagiem, jeśli dokument istnieje
+            w innej wersji, w przeciwnym razie 404 (Not Found).
+    """
+    if expected_version(if_match) is not None:
+        current = await collection.find_one(query, {"version": 1})
+        if current is not None:
+            raise HTTPException(status_code=412, detail="Calendar entry was modified",
+                                headers={"ETag": day_etag(current)})
+    raise HTTPException(status_code=404, detail=detail)
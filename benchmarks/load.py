@@ -0,0 +1,335 @@
+"""
+Powtarzalny test obciążeniowy API uruchamiany w jednym procesie, bez sieci.
+
+Aplikacja działa in-process (httpx + ASGITransport) na lokalnym mongod (--mongo-url) albo
+na zastępczej bazie w pamięci (mongomock-motor, gdy --mongo-url nie podano). Skrypt zasiewa
+syntetycznych użytkowników, ćwiczenia i wieloletnie kalendarze, uruchamia scenariusze
+(logowania, synchronizacja kroków, odczyty kalendarza, katalog ćwiczeń, GET /sync) i zapisuje raport
+JSON z p50/p95/p99 i przepustowością dla każdego endpointu. Jeśli istnieje baseline, wyniki
+są z nim porównywane, a regresja kończy skrypt kodem 1.
+
+Uruchomienie:
+    pip install -r requirements-dev.txt
+    python -m benchmarks.load --users 20 --years 3 --requests 200
+    python -m benchmarks.load --mongo-url mongodb://localhost:27017 --update-baseline
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import platform
+from datetime import datetime, date, timedelta
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_REPORT = os.path.join(os.path.dirname(__file__), "report.json")
+
+
+def percentile(values: list, q: float) -> float:
+    """Percentyl metodą najbliższej rangi (values muszą być posortowane)."""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+class Recorder:
+    """Zbiera czasy odpowiedzi i błędy per endpoint."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.elapsed = {}
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self) -> dict:
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            elapsed = self.elapsed.get(endpoint) or sum(values)
+            result[endpoint] = {
+                "count": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            }
+        return result
+
+
+async def seed(db, users: int, years: int, exercises: int, rng: random.Random) -> list:
+    """
+    Zasiewa bazę syntetycznymi danymi.
+
+    Returns:
+        list: Dane logowania użytkowników [(email, hasło)].
+    """
+    from app.auth import hash_password_async
+    from app.config import DEFAULT_MAX_STEPS
+
+    password = "benchmark-password"
+    hashed = await hash_password_async(password)  # jeden hash dla wszystkich - zasiew nie mierzy bcrypta
+    credentials = [(f"user{n}@bench.movemate.app", password) for n in range(users)]
+    result = await db.users.insert_many([
+        {"username": f"user{n}", "email": email, "password": hashed, "role": "user"}
+        for n, (email, _) in enumerate(credentials)
+    ])
+
+    types, difficulties = ["cardio", "strength", "flexibility", "balance"], ["easy", "medium", "hard"]
+    catalog = await db.exercises.insert_many([
+        {"name": f"Exercise {n}", "description": f"Synthetic exercise number {n}",
+         "exerciseType": rng.choice(types), "difficulty": rng.choice(difficulties), "updated_at": datetime.utcnow()}
+        for n in range(exercises)
+    ])
+    exercise_ids = [str(exercise_id) for exercise_id in catalog.inserted_ids]
+
+    first_day = date.today() - timedelta(days=365 * years)
+    for user_id in result.inserted_ids:
+        days = []
+        for offset in range(365 * years):
+            day = first_day + timedelta(days=offset)
+            days.append({
+                "user_id": str(user_id),
+                "date": datetime(day.year, day.month, day.day),
+                "steps": rng.randint(1000, 18000),
+                "maxSteps": DEFAULT_MAX_STEPS,
+                "version": 1,
+                "updated_at": datetime.utcnow(),
+                "exercises": [
+                    {"id": f"{offset}-{n}", "exercise_id": rng.choice(exercise_ids), "hour": "08:00",
+                     "duration_min": rng.randint(10, 60), "done": rng.random() < 0.7}
+                    for n in range(rng.randint(0, 3))
+                ],
+            })
+        await db.calendar.insert_many(days)
+    return credentials
+
+
+async def timed(recorder: Recorder, endpoint: str, request):
+    started = time.perf_counter()
+    response = await request
+    recorder.record(endpoint, time.perf_counter() - started, response.status_code < 400)
+    return response
+
+
+async def run_scenario(name: str, recorder: Recorder, tasks: list, concurrency: int):
+    """Wykonuje zadania scenariusza z ograniczoną współbieżnością i zapisuje łączny czas."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(task):
+        async with semaphore:
+            await task()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(task) for task in tasks))
+    elapsed = time.perf_counter() - started
+    for endpoint in list(recorder.latencies):
+        if endpoint.startswith(f"{name}:") and endpoint not in recorder.elapsed:
+            recorder.elapsed[endpoint] = elapsed
+    print(f"  {name}: {len(tasks)} żądań w {elapsed:.2f} s")
+
+
+async def run_workloads(client, credentials: list, args, rng: random.Random) -> Recorder:
+    recorder = Recorder()
+
+    async def login(email, password):
+        response = await timed(recorder, "login:POST /login",
+                               client.post("/login", data={"username": email, "password": password}))
+        if response.status_code != 200:
+            return None  # np. 503 z przepełnionej puli bcrypta
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    # Logowania - burza równoczesnych logowań (koszt bcrypta)
+    tokens = []
+
+    def login_task(email, password):
+        async def task():
+            tokens.append(await login(email, password))
+        return task
+
+    logins = [login_task(*rng.choice(credentials)) for _ in range(args.logins)]
+    await run_scenario("login", recorder, logins, args.concurrency)
+    headers = [token for token in tokens if token is not None] or [await login(*credentials[0])]
+
+    # Synchronizacja kroków - przyrosty z zegarka i paczki historii
+    def steps_task():
+        auth = rng.choice(headers)
+        if rng.random() < 0.8:
+            return lambda: timed(recorder, "steps_sync:PUT /steps/today", client.put(
+                "/steps/today", params={"delta": "true"}, json={"steps": rng.randint(10, 500)}, headers=auth))
+        first = date.today() - timedelta(days=rng.randint(1, 30))
+        batch = [{"date": (first + timedelta(days=n)).isoformat(), "steps": rng.randint(1000, 15000)}
+                 for n in range(7)]
+        return lambda: timed(recorder, "steps_sync:POST /steps/batch",
+                             client.post("/steps/batch", json=batch, headers=auth))
+
+    await run_scenario("steps_sync", recorder, [steps_task() for _ in range(args.requests)], args.concurrency)
+
+    # Odczyty kalendarza - miesiąc z rozwinięciem ćwiczeń i strona historii kroków
+    def calendar_task():
+        auth = rng.choice(headers)
+        start = date.today() - timedelta(days=rng.randint(30, 365 * args.years))
+        if rng.random() < 0.7:
+            params = {"from": start.isoformat(), "to": (start + timedelta(days=30)).isoformat(), "expand": "exercise"}
+            return lambda: timed(recorder, "calendar_read:GET /calendar",
+                                 client.get("/calendar", params=params, headers=auth))
+        return lambda: timed(recorder, "calendar_read:GET /steps/history",
+                             client.get("/steps/history", params={"limit": 100}, headers=auth))
+
+    await run_scenario("calendar_read", recorder, [calendar_task() for _ in range(args.requests)], args.concurrency)
+
+    # Katalog ćwiczeń - pełne pobranie i rewalidacja przez ETag
+    etag = (await client.get("/exercises", headers=headers[0])).headers.get("etag")
+
+    def catalog_task():
+        auth = rng.choice(headers)
+        if etag and rng.random() < 0.5:
+            return lambda: timed(recorder, "catalog:GET /exercises (304)",
+                                 client.get("/exercises", headers={**auth, "If-None-Match": etag}))
+        return lambda: timed(recorder, "catalog:GET /exercises", client.get("/exercises", headers=auth))
+
+    await run_scenario("catalog", recorder, [catalog_task() for _ in range(args.requests)], args.concurrency)
+
+    # Synchronizacja przyrostowa - stan ustalony: token po pełnej synchronizacji, od tamtej pory mało zmian
+    sync_tokens = []
+    for auth in headers[:5]:
+        page = {"has_more": True, "token": None}
+        while page["has_more"]:
+            params = {"since": page["token"]} if page["token"] else {}
+            page = (await client.get("/sync", params=params, headers=auth)).json()
+        sync_tokens.append((auth, page["token"]))
+
+    def sync_task():
+        auth, token = rng.choice(sync_tokens)
+        return lambda: timed(recorder, "sync:GET /sync (delta)",
+                             client.get("/sync", params={"since": token}, headers=auth))
+
+    await run_scenario("sync", recorder, [sync_task() for _ in range(args.requests)], args.concurrency)
+    return recorder
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Porównuje wyniki z baseline.
+
+    Returns:
+        list: Opisy regresji (p95 wolniejsze lub przepustowość niższa o więcej niż `tolerance`).
+    """
+    regressions = []
+    for endpoint, base in baseline.get("endpoints", {}).items():
+        current = results.get(endpoint)
+        if current is None:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {current['p95_ms']} ms > {base['p95_ms']} ms")
+        if base["throughput_rps"] and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: {current['throughput_rps']} req/s < {base['throughput_rps']} req/s")
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(f"{endpoint}: {current['errors']} błędów")
+    return regressions
+
+
+async def main_async(args) -> int:
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    import httpx
+    from app import database
+    from app.main import app
+
+    if not args.mongo_url:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("Brak --mongo-url i pakietu mongomock-motor (pip install -r requirements-dev.txt)", file=sys.stderr)
+            return 2
+        database.AsyncIOMotorClient = lambda *_, **__: AsyncMongoMockClient()
+
+    else:
+        # Baza aplikacji ma stałą nazwę - nie nadpisujemy danych bez wyraźnej zgody
+        client = database.AsyncIOMotorClient(args.mongo_url)
+        try:
+            if await client["fitness_app"].users.estimated_document_count() and not args.reset:
+                print("Baza fitness_app zawiera dane - użyj --reset, aby ją wyczyścić", file=sys.stderr)
+                return 2
+            await client.drop_database("fitness_app")
+        finally:
+            client.close()
+
+    rng = random.Random(args.seed)
+    async with app.router.lifespan_context(app):
+        db = database.db
+        print(f"Zasiew: {args.users} użytkowników, {args.years} lat kalendarza, {args.exercises} ćwiczeń")
+        credentials = await seed(db, args.users, args.years, args.exercises, rng)
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)  # 500 liczony jako błąd
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            recorder = await run_workloads(client, credentials, args, rng)
+
+    results = recorder.summary()
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "backend": "mongod" if args.mongo_url else "in-memory",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "params": {key: value for key, value in vars(args).items() if key not in ("mongo_url", "baseline", "report", "reset")},
+        },
+        "endpoints": results,
+    }
+
+    print(f"\n{'endpoint':45} {'n':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for endpoint, stats in results.items():
+        print(f"{endpoint:45} {stats['count']:5} {stats['errors']:4} {stats['p50_ms']:9.2f} "
+              f"{stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} {stats['throughput_rps']:9.1f}")
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            exit_code = 1
+            print("\nRegresje względem baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+        else:
+            print("\nBrak regresji względem baseline.")
+
+    with open(args.report, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Raport: {args.report}")
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Zapisano baseline: {args.baseline}")
+    return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="Lokalny mongod (domyślnie baza w pamięci)")
+    parser.add_argument("--reset", action="store_true", help="Wyczyść bazę fitness_app na --mongo-url przed zasiewem")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3, help="Długość historii kalendarza")
+    parser.add_argument("--exercises", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=50, help="Liczba logowań w burzy logowań")
+    parser.add_argument("--requests", type=int, default=300, help="Liczba żądań na scenariusz")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--report", default=DEFAULT_REPORT)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dopuszczalne pogorszenie (0.2 = 20%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Zapisz wyniki jako nowy baseline")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
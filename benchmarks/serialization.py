@@ -0,0 +1,85 @@
+"""
+Mikrobenchmark serializacji listy dni kalendarza: ścieżka Pydantic (response_model) kontra szybka ścieżka.
+
+Uruchomienie: python -m benchmarks.serialization --items 500 --repeat 20
+"""
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pydantic import TypeAdapter
+from app.schemas import CalendarResponse, Page
+from app.utils.serialization import dumps, calendar_item, orjson
+
+
+def make_days(count: int, exercises_per_day: int) -> list:
+    """Syntetyczne dokumenty dni w kształcie z kolekcji `calendar`."""
+    user_id = str(ObjectId())
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "date": start + timedelta(days=day),
+            "steps": 4000 + day * 7 % 9000,
+            "maxSteps": 10000,
+            "hourlySteps": {str(hour): 300 + hour for hour in range(7, 22)},
+            "exercises": [
+                {"id": str(ObjectId()), "exercise_id": str(ObjectId()), "hour": "08:00", "duration_min": 30,
+                 "numberOfSets": 3, "numberOfRepetitions": 12, "weight": 20.5, "done": day % 2 == 0}
+                for _ in range(exercises_per_day)
+            ],
+        }
+        for day in range(count)
+    ]
+
+
+def pydantic_path(docs: list, adapter: TypeAdapter) -> bytes:
+    """Odtwarza obecną ścieżkę: modele w handlerze, ponowna walidacja response_model, jsonable i json.dumps."""
+    entries = []
+    for doc in docs:
+        doc = dict(doc, id=str(doc["_id"]))
+        entries.append(CalendarResponse(**doc))
+    page = Page(items=entries, next_cursor=None)
+    validated = adapter.validate_python(page.model_dump())
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def fast_path(docs: list) -> bytes:
+    """Szybka ścieżka: dokument -> słownik -> bajty (orjson)."""
+    return dumps({"items": [calendar_item(doc) for doc in docs], "next_cursor": None})
+
+
+def measure(func, repeat: int) -> float:
+    """Najlepszy czas z `repeat` powtórzeń (w sekundach)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=500, help="Liczba dni na stronie")
+    parser.add_argument("--exercises", type=int, default=3, help="Liczba ćwiczeń w dniu")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    docs = make_days(args.items, args.exercises)
+    adapter = TypeAdapter(Page[CalendarResponse])
+    assert json.loads(pydantic_path(docs, adapter)) == json.loads(fast_path(docs)), "Ścieżki zwracają różne dane"
+
+    slow = measure(lambda: pydantic_path(docs, adapter), args.repeat)
+    fast = measure(lambda: fast_path(docs), args.repeat)
+    print(f"Dni: {args.items}, ćwiczeń w dniu: {args.exercises}, orjson: {'tak' if orjson else 'nie'}")
+    print(f"Pydantic (response_model): {slow * 1e6 / args.items:8.1f} µs/dzień  ({slow * 1e3:.1f} ms)")
+    print(f"Szybka ścieżka:            {fast * 1e6 / args.items:8.1f} µs/dzień  ({fast * 1e3:.1f} ms)")
+    print(f"Przyspieszenie:            {slow / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()